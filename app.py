@@ -1,5 +1,6 @@
 # app.py - FIXED: 5-step workflow with AI in sidebar
 import os
+import time
 import streamlit as st
 from dotenv import load_dotenv
 
@@ -7,9 +8,11 @@ from dotenv import load_dotenv
 from core.workflow_manager import WorkflowManager
 from core.session_manager import SessionManager
 from backend.ai_service import AIService
+from backend.ai_jobs import get_job_manager
 from backend.data_processor import DataProcessor
 from frontend.ui_components import UIComponents
 from helpers.file_handler import FileHandler
+from config.settings import AppSettings
 
 # Load environment variables
 load_dotenv()
@@ -73,6 +76,11 @@ class ShopifyCSVBuilder:
             if st.button("Continue to Column Mapping →", type="primary"):
                 self.session.set_current_step(2)
                 st.rerun()
+            if self.session.get('saved_mapping_restored'):
+                if st.button("Use Saved Mapping → Description Builder"):
+                    self.workflow.apply_saved_mapping(self.session)
+                    self.session.set_current_step(3)
+                    st.rerun()
     
     def _step_mapping(self):
         """Step 2: Enhanced Column Mapping"""
@@ -87,6 +95,7 @@ class ShopifyCSVBuilder:
                 st.rerun()
         with col2:
             if st.button("Continue to Description Builder →", type="primary"):
+                self.workflow.save_confirmed_mapping(self.session)
                 self.session.set_current_step(3)
                 st.rerun()
     
@@ -135,14 +144,63 @@ class ShopifyCSVBuilder:
             if self.session.get('processed_data') is None:
                 self.workflow.execute_data_processing(self.ui, self.data_processor, self.session)
             
-            processed_df = self.session.get('processed_data')
-            column_mapping = self.session.get_mappings()
-            enhanced_df = self.ai_service.process_descriptions(processed_df, column_mapping, config['mode'])
-            self.session.set('processed_data', enhanced_df)
+            if not self._run_ai_job(config['mode']):
+                return
         
         # Generate CSV
         if not self.workflow.execute_csv_generation(self.ui, self.data_processor, self.session):
             return
+    
+    def _run_ai_job(self, mode):
+        """AI enhancement as a background job - returns True once processed_data holds its result"""
+        jobs = get_job_manager()
+        
+        # Already enhanced for this mode (completely, or up to a stop)
+        if self.session.get('ai_enhanced_mode') == mode:
+            if self.session.get('ai_job_error'):
+                st.error(f"AI processing failed: {self.session.get('ai_job_error')}")
+                st.warning("Continuing with original descriptions...")
+            run_summary = self.session.get('ai_run_summary')
+            self.ai_service.show_run_summary(run_summary)
+            self.ui.render_ai_usage(run_summary.get('usage') if run_summary else None)
+            if self.session.get('ai_stopped'):
+                st.info("AI enhancement was stopped - products not yet enhanced keep their original text.")
+                if st.button("▶ Resume AI enhancement"):
+                    self.session.set('ai_stopped', False)
+                    self.session.set('ai_enhanced_mode', None)
+                    st.rerun()
+            return True
+        
+        job_id = self.session.get('ai_job_id')
+        job = jobs.get(job_id) if job_id else None
+        if job is None:
+            # Create the model client on this thread, so a configuration error is shown on the page
+            if self.ai_service.model is None:
+                return True
+            # The job gets its own copy - the session's frame must not change under the script thread
+            processed_df = self.session.get('processed_data').copy()
+            job_id = jobs.submit(self.ai_service, processed_df, self.session.get_mappings(), mode)
+            self.session.set('ai_job_id', job_id)
+            job = jobs.get(job_id)
+        
+        if not job.is_finished():
+            self.ui.render_ai_job_progress(job)
+            if st.button("⏹ Stop AI enhancement"):
+                jobs.cancel(job_id)
+            # Poll: rerun the page until the job finishes; interacting meanwhile just reruns sooner
+            time.sleep(AppSettings.AI_JOB_POLL_SECONDS)
+            st.rerun()
+        
+        # Finished - take the result into the session
+        if job.result is not None:
+            self.session.set('processed_data', job.result)
+        self.session.set('ai_run_summary', job.summary)
+        self.session.set('ai_job_error', job.error)
+        self.session.set('ai_stopped', job.status == job.CANCELLED)
+        self.session.set('ai_enhanced_mode', mode)
+        self.session.set('ai_job_id', None)
+        jobs.discard(job_id)
+        st.rerun()
 
 def main():
     """Application entry point"""
@@ -0,0 +1,175 @@
+# backend/ai_cache.py - Persistent cache for AI responses
+"""
+On-disk cache of Gemini responses, keyed by a hash of model + mode + prompt.
+The prompt already contains the template and the input text, so an unchanged
+product never needs a second request.
+
+Prune from the command line:
+    python -m backend.ai_cache prune [--ttl-days N] [--max-mb N]
+    python -m backend.ai_cache stats
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from config.constants import AI_CACHE_PATH, AI_CACHE_TTL_DAYS, AI_CACHE_MAX_MB
+
+class AICache:
+    """SQLite cache with TTL expiry and size-based LRU eviction, safe to share between threads"""
+    
+    # Evict after this many writes instead of on every write
+    PRUNE_EVERY_WRITES = 200
+    
+    def __init__(self, path=AI_CACHE_PATH, ttl_days=AI_CACHE_TTL_DAYS, max_mb=AI_CACHE_MAX_MB):
+        self.path = path
+        self.ttl_seconds = ttl_days * 24 * 3600
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        
+        try:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, response TEXT NOT NULL,"
+                " created REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+            self._conn.commit()
+        except (sqlite3.Error, OSError):
+            # Unwritable location - run without a cache
+            self._conn = None
+    
+    @staticmethod
+    def make_key(model_name, mode, prompt):
+        """Content address of one model request"""
+        return hashlib.sha256(f"{model_name}\x1f{mode}\x1f{prompt}".encode("utf-8")).hexdigest()
+    
+    def is_enabled(self):
+        """Check if the cache database is available"""
+        return self._conn is not None
+    
+    def get(self, key):
+        """Cached response for key, or None when missing or expired"""
+        now = time.time()
+        with self._lock:
+            row = None
+            if self._conn is not None:
+                try:
+                    row = self._conn.execute(
+                        "SELECT response FROM responses WHERE key = ? AND created >= ?",
+                        (key, now - self.ttl_seconds)
+                    ).fetchone()
+                    if row:
+                        self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+                        self._conn.commit()
+                except sqlite3.Error:
+                    row = None
+            
+            if row:
+                self.hits += 1
+                return row[0]
+            self.misses += 1
+            return None
+    
+    def set(self, key, response):
+        """Store a response, evicting old entries every PRUNE_EVERY_WRITES writes"""
+        now = time.time()
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, created, last_used) VALUES (?, ?, ?, ?)",
+                    (key, response, now, now)
+                )
+                self._conn.commit()
+            except sqlite3.Error:
+                return
+            
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY_WRITES == 0:
+                self._prune_locked()
+    
+    def prune(self):
+        """Drop expired entries, then least recently used ones until under max size - returns rows removed"""
+        with self._lock:
+            return self._prune_locked()
+    
+    def _prune_locked(self):
+        if self._conn is None:
+            return 0
+        try:
+            removed = self._conn.execute(
+                "DELETE FROM responses WHERE created < ?", (time.time() - self.ttl_seconds,)
+            ).rowcount
+            
+            total_bytes = self._conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(CAST(response AS BLOB)) + LENGTH(key)), 0) FROM responses"
+            ).fetchone()[0]
+            if total_bytes > self.max_bytes:
+                # Walk from least recently used and cut once the remainder fits
+                excess = total_bytes - self.max_bytes
+                cutoff = None
+                freed = 0
+                for last_used, size in self._conn.execute(
+                        "SELECT last_used, LENGTH(CAST(response AS BLOB)) + LENGTH(key) FROM responses ORDER BY last_used"):
+                    freed += size
+                    cutoff = last_used
+                    if freed >= excess:
+                        break
+                removed += self._conn.execute("DELETE FROM responses WHERE last_used <= ?", (cutoff,)).rowcount
+            
+            self._conn.commit()
+            return removed
+        except sqlite3.Error:
+            return 0
+    
+    def stats(self):
+        """Entry count and stored size of the cache"""
+        with self._lock:
+            if self._conn is None:
+                return {'entries': 0, 'bytes': 0}
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(CAST(response AS BLOB)) + LENGTH(key)), 0) FROM responses"
+            ).fetchone()
+            return {'entries': entries, 'bytes': size}
+    
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+def main(argv=None):
+    """Command line entry point: prune or inspect the cache"""
+    parser = argparse.ArgumentParser(prog="python -m backend.ai_cache", description="Manage the AI response cache")
+    parser.add_argument("command", choices=["prune", "stats"])
+    parser.add_argument("--path", default=AI_CACHE_PATH, help="cache database file")
+    parser.add_argument("--ttl-days", type=float, default=AI_CACHE_TTL_DAYS, help="drop entries older than this")
+    parser.add_argument("--max-mb", type=float, default=AI_CACHE_MAX_MB, help="evict least recently used above this size")
+    args = parser.parse_args(argv)
+    
+    cache = AICache(args.path, ttl_days=args.ttl_days, max_mb=args.max_mb)
+    if not cache.is_enabled():
+        print(f"Cache not available at {args.path}")
+        return 1
+    
+    if args.command == "prune":
+        removed = cache.prune()
+        print(f"Removed {removed} entries")
+    stats = cache.stats()
+    print(f"{stats['entries']} entries, {stats['bytes'] / (1024 * 1024):.2f} MB in {args.path}")
+    cache.close()
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,120 @@
+# backend/ai_jobs.py - Background AI jobs that survive Streamlit reruns
+"""
+A Streamlit rerun (any widget interaction) stops the script thread, so AI
+enhancement runs on a thread owned by AIJobManager instead. The manager is a
+process-wide resource (get_job_manager); sessions keep only a job id and poll
+the job's status and progress.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+from config.settings import AppSettings
+
+class AIJob:
+    """One AI enhancement run - status and progress are read by the UI while it runs"""
+    
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    CANCELLED = "cancelled"
+    FAILED = "failed"
+    
+    def __init__(self, job_id, ai_service):
+        self.job_id = job_id
+        self.ai_service = ai_service
+        self.status = self.QUEUED
+        self.done = 0
+        self.total = 0
+        self.result = None
+        self.summary = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.future = None
+        self._cancel_requested = False
+    
+    @property
+    def progress(self):
+        """Fraction of products finished"""
+        return self.done / self.total if self.total else 0.0
+    
+    def is_finished(self):
+        """True once the job will not change any more"""
+        return self.status in (self.DONE, self.CANCELLED, self.FAILED)
+    
+    def cancel(self):
+        """Stop after the requests in flight - products finished so far are kept in the result"""
+        self._cancel_requested = True
+        if self.future is not None and self.future.cancel():
+            self.status = self.CANCELLED
+            self.finished = time.time()
+        self.ai_service.cancel()
+    
+    def run(self, df, column_mapping, mode):
+        """Worker thread body"""
+        self.status = self.RUNNING
+        try:
+            result = self.ai_service.enhance_descriptions(df, column_mapping, mode, on_progress=self._on_progress)
+            self.summary = self.ai_service.last_run
+            # Result first: the UI treats a finished status as "result is ready"
+            self.result = result
+            self.status = self.CANCELLED if self.summary and self.summary['cancelled'] else self.DONE
+        except Exception as e:
+            self.error = str(e)
+            self.status = self.FAILED
+        finally:
+            self.finished = time.time()
+    
+    def _on_progress(self, done, total):
+        """Progress callback from enhance_descriptions"""
+        self.done, self.total = done, total
+        # A cancel that arrived before the run started its cancel event is repeated here
+        if self._cancel_requested:
+            self.ai_service.cancel()
+
+class AIJobManager:
+    """Runs AI jobs on background threads, shared by all sessions of the app"""
+    
+    def __init__(self, max_jobs=None):
+        self._executor = ThreadPoolExecutor(max_workers=max_jobs or AppSettings.AI_MAX_CONCURRENT_JOBS,
+                                            thread_name_prefix="ai-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+    
+    def submit(self, ai_service, df, column_mapping, mode):
+        """Queue an enhancement job - returns its id"""
+        job = AIJob(uuid.uuid4().hex, ai_service)
+        with self._lock:
+            self._prune()
+            self._jobs[job.job_id] = job
+            job.future = self._executor.submit(job.run, df, column_mapping, mode)
+        return job.job_id
+    
+    def get(self, job_id):
+        """The job with this id, or None if it is unknown or was discarded"""
+        with self._lock:
+            return self._jobs.get(job_id)
+    
+    def cancel(self, job_id):
+        """Ask a job to stop"""
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+    
+    def discard(self, job_id):
+        """Forget a job once its session has taken the result"""
+        with self._lock:
+            self._jobs.pop(job_id, None)
+    
+    def _prune(self):
+        """Drop finished jobs whose session never came back for them"""
+        cutoff = time.time() - AppSettings.AI_JOB_RETENTION_MINUTES * 60
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.finished < cutoff]:
+            del self._jobs[job_id]
+
+@st.cache_resource
+def get_job_manager():
+    """Process-wide job manager - kept across reruns and sessions"""
+    return AIJobManager()
@@ -0,0 +1,91 @@
+# backend/ai_journal.py - Checkpoint journal for AI enhancement jobs
+"""
+Completed products of a running AI job are written here as they finish, so a
+rerun of the same job (same model, mode and products) resumes instead of
+starting over. A job's entries are removed once it completes.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from config.constants import AI_JOURNAL_PATH, AI_JOURNAL_MAX_AGE_DAYS
+
+class AIJournal:
+    """SQLite journal of finished products per job"""
+    
+    def __init__(self, path=AI_JOURNAL_PATH, max_age_days=AI_JOURNAL_MAX_AGE_DAYS):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        
+        try:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS journal ("
+                " job_id TEXT NOT NULL, product_key TEXT NOT NULL,"
+                " description TEXT NOT NULL, tags TEXT NOT NULL, created REAL NOT NULL,"
+                " PRIMARY KEY (job_id, product_key))"
+            )
+            # Jobs that were abandoned long ago will not be resumed
+            self._conn.execute("DELETE FROM journal WHERE created < ?", (time.time() - max_age_days * 24 * 3600,))
+            self._conn.commit()
+        except (sqlite3.Error, OSError):
+            # Unwritable location - jobs simply do not resume
+            self._conn = None
+    
+    @staticmethod
+    def make_product_key(handle, description):
+        """Identity of one product within a job"""
+        return hashlib.sha1(f"{handle}\x1f{description}".encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def make_job_id(model_name, mode, product_keys):
+        """Identity of a job: the same products sent to the same model in the same mode"""
+        digest = hashlib.sha256(f"{model_name}\x1f{mode}".encode("utf-8"))
+        for key in product_keys:
+            digest.update(key.encode("ascii"))
+        return digest.hexdigest()
+    
+    def load(self, job_id):
+        """{product_key: (description, tags)} already finished for this job"""
+        with self._lock:
+            if self._conn is None:
+                return {}
+            try:
+                rows = self._conn.execute(
+                    "SELECT product_key, description, tags FROM journal WHERE job_id = ?", (job_id,)
+                ).fetchall()
+            except sqlite3.Error:
+                return {}
+            return {key: (description, tags) for key, description, tags in rows}
+    
+    def record(self, job_id, entries):
+        """Journal finished products - entries are (product_key, description, tags)"""
+        if not entries:
+            return
+        now = time.time()
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO journal (job_id, product_key, description, tags, created) VALUES (?, ?, ?, ?, ?)",
+                    [(job_id, key, description, tags, now) for key, description, tags in entries]
+                )
+                self._conn.commit()
+            except sqlite3.Error:
+                pass
+    
+    def clear(self, job_id):
+        """Forget a finished job"""
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute("DELETE FROM journal WHERE job_id = ?", (job_id,))
+                self._conn.commit()
+            except sqlite3.Error:
+                pass
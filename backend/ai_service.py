@@ -1,85 +1,419 @@
 # services/ai_service.py - Simplified AI processing service
+import json
 import os
+import random
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+import pandas as pd
 import streamlit as st
-import google.generativeai as genai
-from helpers.utils import get_column_value, clean_value
+from config.constants import GEMINI_MODEL_NAME, AI_REQUEST_TIMEOUT, AI_RETRY_ATTEMPTS
+from config.settings import AppSettings
+from backend.ai_cache import AICache
+from backend.ai_journal import AIJournal
+from backend.ai_usage import AIUsageTracker
+from backend.rate_limiter import RateLimiter
+from helpers.utils import get_column_series, clean_series
+from helpers.text_dedup import group_descriptions
+
+@st.cache_resource
+def _gemini_model(api_key):
+    """Gemini client, configured once per process - the SDK is only imported here, on first AI use"""
+    import google.generativeai as genai
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(GEMINI_MODEL_NAME)
+
+@st.cache_resource
+def _shared_backends():
+    """Response cache, job journal and rate limiter shared by every rerun and session"""
+    return AICache(), AIJournal(), RateLimiter(AppSettings.AI_REQUESTS_PER_MINUTE, AppSettings.AI_TOKENS_PER_MINUTE)
 
 class AIService:
-    """Clean AI service with focused responsibilities"""
+    """Clean AI service with focused responsibilities
+    
+    Cheap to construct on every rerun: the model client, the cache, journal
+    and rate limiter are all created on first use and shared by the process.
+    """
+    
+    # Progress bar updates per run - worker completions are batched into these
+    PROGRESS_UPDATES = 100
+    
+    # Error marker for products skipped after cancel()
+    CANCELLED = "cancelled"
+    
+    # HTTP statuses worth retrying: rate limited, or a transient server error
+    RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+    
+    def __init__(self, model=None, max_workers=None, cache=None, rate_limiter=None, journal=None):
+        self.max_workers = max_workers or AppSettings.AI_MAX_WORKERS
+        # Unless given, the shared backends are opened on first AI use - not when AI is disabled
+        self._cache = cache
+        self._journal = journal
+        self._rate_limiter = rate_limiter
+        self.last_run = None
+        self._cancel_event = threading.Event()
+        self.usage = AIUsageTracker()
+        self._model = model
+        self._model_failed = False
+        self.api_key = None
+        if model is None:
+            self.api_key = self._read_api_key()
+    
+    @property
+    def cache(self):
+        """Response cache"""
+        if self._cache is None:
+            self._cache = _shared_backends()[0]
+        return self._cache
+    
+    @property
+    def journal(self):
+        """Job journal"""
+        if self._journal is None:
+            self._journal = _shared_backends()[1]
+        return self._journal
+    
+    @property
+    def rate_limiter(self):
+        """Request and token rate limiter"""
+        if self._rate_limiter is None:
+            self._rate_limiter = _shared_backends()[2]
+        return self._rate_limiter
     
-    def __init__(self):
-        self.api_key = os.getenv("GEMINI_API_KEY") or st.secrets.get("GEMINI_API_KEY")
-        self.model = None
-        self._initialize_model()
+    def _read_api_key(self):
+        """GEMINI_API_KEY from the environment, else from Streamlit secrets"""
+        api_key = os.getenv("GEMINI_API_KEY")
+        if api_key:
+            return api_key
+        try:
+            return st.secrets.get("GEMINI_API_KEY")
+        except Exception:
+            # No secrets file - AI stays disabled
+            return None
+    
+    @property
+    def model(self):
+        """Gemini model, created on first use"""
+        if self._model is None and self.api_key and not self._model_failed:
+            self._initialize_model()
+        return self._model
     
     def _initialize_model(self):
         """Initialize Gemini model"""
-        if self.api_key:
-            try:
-                genai.configure(api_key=self.api_key)
-                self.model = genai.GenerativeModel('models/gemini-2.5-flash')
-            except Exception as e:
-                st.warning(f"AI initialization failed: {e}")
-                self.model = None
+        try:
+            self._model = _gemini_model(self.api_key)
+        except Exception as e:
+            st.warning(f"AI initialization failed: {e}")
+            self._model_failed = True
     
     def is_enabled(self):
-        """Check if AI service is available"""
-        return self.model is not None
+        """Check if AI service is available - an API key is set (the model itself is created on first use)"""
+        return self._model is not None or (bool(self.api_key) and not self._model_failed)
     
     def process_descriptions(self, df, column_mapping, mode):
-        """Process descriptions with AI enhancement"""
-        if not self.is_enabled():
+        """Process descriptions with AI enhancement, showing progress in the current script run"""
+        # Create the model up front: if that fails there is no run to show progress for
+        if not self.is_enabled() or self.model is None:
             return df
         
         progress_bar = st.progress(0)
         status_text = st.empty()
         
-        custom_descs, all_tags = [], []
+        def show_progress(done, total):
+            progress_bar.progress(done / total)
+            status_text.text(f"Processed {done}/{total} products...")
         
         with st.spinner("AI is enhancing your descriptions..."):
-            for i, (_, row) in enumerate(df.iterrows()):
-                title = get_column_value(row, column_mapping, 'title', 'Unknown')
-                status_text.text(f"Processing {i+1}/{len(df)}: {str(title)[:30]}...")
-                
-                original_desc = clean_value(get_column_value(row, column_mapping, 'description', ""))
-                
-                if mode == "Simple mode (first sentence + tags)":
-                    desc, tags = self._process_simple_mode(original_desc)
-                elif mode == "Full AI mode (custom description + tags)":
-                    desc, tags = self._process_full_ai_mode(original_desc)
-                else:
-                    desc, tags = original_desc, ""
-                
-                custom_descs.append(desc)
-                all_tags.append(tags)
+            status_text.text(f"Processing {len(df)} variants with {self.max_workers} parallel requests...")
+            df = self.enhance_descriptions(df, column_mapping, mode, show_progress)
+        
+        status_text.text("AI processing stopped - finished products are saved" if self.last_run['cancelled']
+                         else "AI processing complete!")
+        self.show_run_summary(self.last_run)
+        return df
+    
+    def enhance_descriptions(self, df, column_mapping, mode, on_progress=None):
+        """Add custom_description and ai_tags columns - safe to run outside the Streamlit script thread
+        
+        Rows are sent to the model from a pool of max_workers threads and results
+        are written back in row order. on_progress(done, total) is called from
+        this thread as products finish. Finished products are journaled as they
+        complete, so an interrupted or cancelled job picks up where it stopped.
+        A summary of the run is left in last_run.
+        """
+        if self.model is None:
+            return df
+        
+        # One request per product: variant rows of a Handle share their description
+        descriptions = clean_series(get_column_series(df, column_mapping, 'description', ""))
+        product_codes = self._product_codes(df, descriptions)
+        first_rows = pd.Series(range(len(df))).groupby(product_codes, sort=True).first().to_numpy()
+        product_descriptions = descriptions.iloc[first_rows].tolist()
+        handles = df["Handle"].iloc[first_rows].tolist() if "Handle" in df.columns else [""] * len(first_rows)
+        product_keys = [AIJournal.make_product_key(handle, desc) for handle, desc in zip(handles, product_descriptions)]
+        
+        total = len(product_descriptions)
+        # Products that never finish keep their original text
+        results = [(desc, "") for desc in product_descriptions]
+        
+        # Resume from the journal of an earlier, interrupted run of this job
+        job_id = AIJournal.make_job_id(GEMINI_MODEL_NAME, mode, product_keys)
+        journaled = self.journal.load(job_id)
+        pending = []
+        for i, key in enumerate(product_keys):
+            if key in journaled:
+                results[i] = journaled[key]
+            else:
+                pending.append(i)
+        resumed = total - len(pending)
+        
+        # Identical (or, if configured, near-identical) descriptions are requested once and fanned out
+        representatives = group_descriptions([product_descriptions[i] for i in pending],
+                                             AppSettings.AI_NEAR_DUPLICATE_THRESHOLD)
+        members = {}
+        for position, representative in enumerate(representatives):
+            members.setdefault(pending[representative], []).append(pending[position])
+        saved_calls = sum(len(group) - 1 for i, group in members.items() if product_descriptions[i])
+        
+        errors = []
+        cache_hits, cache_misses = self.cache.hits, self.cache.misses
+        self.usage = AIUsageTracker()
+        self._cancel_event.clear()
+        
+        update_every = max(1, total // self.PROGRESS_UPDATES)
+        done, next_update = resumed, resumed + update_every
+        if on_progress and total:
+            on_progress(done, total)
+        
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        futures = {}
+        try:
+            for batch in self._make_batches(product_descriptions, mode, list(members)):
+                future = executor.submit(self._process_batch, [product_descriptions[i] for i in batch], mode)
+                # Journal from the worker, so batches still in flight after a cancel or rerun are kept
+                member_products = [[(product_keys[j], product_descriptions[j]) for j in members[i]] for i in batch]
+                future.add_done_callback(partial(self._journal_batch, job_id, mode, member_products))
+                futures[future] = batch
+            
+            for future in as_completed(futures):
+                batch = futures[future]
+                for i, (desc, tags, error) in zip(batch, future.result()):
+                    if error:
+                        if error != self.CANCELLED:
+                            errors.append(error)
+                        continue
+                    for j in members[i]:
+                        results[j] = self._member_result(product_descriptions[j], mode, desc, tags)
                 
-                progress_bar.progress((i + 1) / len(df))
-                time.sleep(0.1)
+                done += sum(len(members[i]) for i in batch)
+                if self._cancel_event.is_set():
+                    break
+                if on_progress and (done >= next_update or done == total):
+                    next_update = done + update_every
+                    on_progress(done, total)
+        finally:
+            # A cancel or a Streamlit rerun lands here with work left: drop the queue, don't wait
+            unfinished = not all(future.done() for future in futures)
+            if unfinished:
+                self._cancel_event.set()
+            executor.shutdown(wait=not unfinished, cancel_futures=unfinished)
+        
+        cancelled = self._cancel_event.is_set()
+        if not cancelled and not errors:
+            self.journal.clear(job_id)
         
-        status_text.text("AI processing complete!")
+        self.last_run = {'total': total, 'resumed': resumed, 'failed': len(errors), 'cancelled': cancelled,
+                         'saved_calls': saved_calls, 'first_error': errors[0] if errors else None,
+                         'cache_hits': self.cache.hits - cache_hits, 'cache_misses': self.cache.misses - cache_misses,
+                         'usage': self.usage.summary()}
         
-        df["custom_description"] = custom_descs
-        df["ai_tags"] = all_tags
+        # Broadcast product results back to every variant row
+        df["custom_description"] = [results[code][0] for code in product_codes]
+        df["ai_tags"] = [results[code][1] for code in product_codes]
         
         return df
     
+    def show_run_summary(self, run):
+        """Show the outcome of an enhance_descriptions run (its last_run)"""
+        if not run:
+            return
+        if run['resumed']:
+            st.info(f"Resumed: {run['resumed']} of {run['total']} products restored from the previous run")
+        if run['failed']:
+            st.warning(f"AI processing failed for {run['failed']} products, original text kept: {run['first_error']}")
+        st.caption(f"AI cache: {run['cache_hits']} hits • {run['cache_misses']} misses • "
+                   f"{run['saved_calls']} requests saved by merging duplicate descriptions")
+    
+    def _journal_batch(self, job_id, mode, member_products, future):
+        """Done-callback: journal every product sharing a successful request of a finished batch"""
+        if future.cancelled() or future.exception() is not None:
+            return
+        self.journal.record(job_id, [(key, *self._member_result(text, mode, desc, tags))
+                                     for products, (desc, tags, error) in zip(member_products, future.result())
+                                     if not error
+                                     for key, text in products])
+    
+    def _member_result(self, text, mode, desc, tags):
+        """Result for a product that shared its group's request
+        
+        Grouping folds case and whitespace, so in simple mode - where the
+        description is the product's own first sentence, not AI output - only
+        the tags are shared.
+        """
+        if mode == "Simple mode (first sentence + tags)":
+            return self._first_sentence(text), tags
+        return desc, tags
+    
+    def cancel(self):
+        """Stop a running process_descriptions after the requests in flight - finished products stay journaled"""
+        self._cancel_event.set()
+    
+    def _product_codes(self, df, descriptions):
+        """Product number per row - rows with the same Handle and description are one product"""
+        handles = df["Handle"] if "Handle" in df.columns else pd.Series("", index=df.index)
+        products = pd.DataFrame({"handle": handles.to_numpy(), "description": descriptions.to_numpy()})
+        return products.groupby(["handle", "description"], sort=False, dropna=False).ngroup().to_numpy()
+    
+    def _make_batches(self, descriptions, mode, indices):
+        """Group product indices into requests - full AI mode packs descriptions up to the token budget"""
+        if mode != "Full AI mode (custom description + tags)":
+            return [[i] for i in indices]
+        
+        batches, batch, batch_tokens = [], [], 0
+        for i in indices:
+            text = descriptions[i]
+            if not text:
+                batches.append([i])  # nothing to send
+                continue
+            tokens = self._estimate_tokens(text)
+            if batch and (batch_tokens + tokens > AppSettings.AI_BATCH_TOKEN_BUDGET
+                          or len(batch) >= AppSettings.AI_BATCH_MAX_ITEMS):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(i)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+    
+    def _estimate_tokens(self, text):
+        """Rough token count - about 4 characters per token, plus per-item JSON overhead"""
+        return len(text) // 4 + 20
+    
+    def _process_batch(self, descriptions, mode):
+        """Run one request in a worker thread - returns (description, tags, error) per input"""
+        if self._cancel_event.is_set():
+            return [(text, "", self.CANCELLED) for text in descriptions]
+        
+        if len(descriptions) == 1 or mode != "Full AI mode (custom description + tags)":
+            return [self._process_row(text, mode) for text in descriptions]
+        
+        # Items answered before (as single or batched requests) come from the cache
+        results = [None] * len(descriptions)
+        pending = []
+        for i, text in enumerate(descriptions):
+            cached = self.cache.get(AICache.make_key(GEMINI_MODEL_NAME, "full", self._full_ai_prompt(text)))
+            if cached is not None:
+                results[i] = (*self._split_full_ai_reply(cached), None)
+            else:
+                pending.append(i)
+        
+        parsed = {}
+        if len(pending) > 1:
+            try:
+                parsed = self._process_full_ai_batch([descriptions[i] for i in pending])
+            except Exception:
+                parsed = {}  # every item falls back to a single request
+        
+        for position, i in enumerate(pending):
+            if position in parsed:
+                desc, tags = parsed[position]
+                self.cache.set(AICache.make_key(GEMINI_MODEL_NAME, "full", self._full_ai_prompt(descriptions[i])),
+                               f"{desc}\n{tags}")
+                results[i] = (desc, tags, None)
+            else:
+                # Already looked up above - a second lookup would count the miss twice
+                results[i] = self._process_row(descriptions[i], mode, cache_lookup=False)
+        
+        return results
+    
+    def _process_full_ai_batch(self, texts):
+        """One JSON request for several descriptions - returns {item position: (description, tags)} for parsed items"""
+        items = [{"id": i, "description": text} for i, text in enumerate(texts)]
+        prompt = (
+            "You are a Shopify copywriter. For each product below, rewrite the description to be engaging and clear,\n"
+            "then provide 5 comma-separated tags.\n\n"
+            f"Products (JSON): {json.dumps(items, ensure_ascii=False)}\n\n"
+            "Respond with only a JSON array, one object per product:\n"
+            '[{"id": <id>, "description": "<enhanced description>", "tags": "tag1,tag2,tag3,tag4,tag5"}]'
+        )
+        response = self._call_model(prompt, "batch")
+        return self._parse_batch_reply(response.text or "", len(texts))
+    
+    def _parse_batch_reply(self, reply, count):
+        """Valid entries of a batched JSON reply - anything malformed is left out and retried on its own"""
+        # Models sometimes wrap the array in a code fence or a sentence
+        start, end = reply.find("["), reply.rfind("]")
+        if start < 0 or end <= start:
+            return {}
+        try:
+            entries = json.loads(reply[start:end + 1])
+        except ValueError:
+            return {}
+        
+        parsed = {}
+        for entry in entries if isinstance(entries, list) else []:
+            if not isinstance(entry, dict):
+                continue
+            try:
+                position = int(entry.get("id"))
+            except (TypeError, ValueError):
+                continue
+            desc = entry.get("description")
+            tags = entry.get("tags", "")
+            if isinstance(tags, list):
+                tags = ",".join(str(tag).strip() for tag in tags)
+            if 0 <= position < count and isinstance(desc, str) and desc.strip():
+                parsed[position] = (" ".join(desc.split()), str(tags).strip())
+        return parsed
+    
+    def _process_row(self, original_desc, mode, cache_lookup=True):
+        """Run one row in a worker thread - returns (description, tags, error message or None)"""
+        try:
+            if mode == "Simple mode (first sentence + tags)":
+                return (*self._process_simple_mode(original_desc), None)
+            elif mode == "Full AI mode (custom description + tags)":
+                return (*self._process_full_ai_mode(original_desc, cache_lookup), None)
+            return original_desc, "", None
+        except Exception as e:
+            return original_desc, "", str(e)
+    
     def _process_simple_mode(self, text):
         """Extract first sentence and generate tags"""
         if not text:
             return "", ""
         
-        first_sentence = text.split(".", 1)[0].strip()
+        first_sentence = self._first_sentence(text)
         tags = self._generate_tags(first_sentence)
         
         return first_sentence, tags
     
-    def _process_full_ai_mode(self, text):
+    def _first_sentence(self, text):
+        """Text up to the first full stop"""
+        return text.split(".", 1)[0].strip()
+    
+    def _process_full_ai_mode(self, text, cache_lookup=True):
         """Generate enhanced description and tags"""
         if not text:
             return "", ""
         
-        prompt = (
+        # Failures propagate to _process_row, which keeps the original text
+        return self._split_full_ai_reply(self._generate(self._full_ai_prompt(text), "full", cache_lookup))
+    
+    def _full_ai_prompt(self, text):
+        """Single-product rewrite prompt"""
+        return (
             "You are a Shopify copywriter. Rewrite this product description to be engaging and clear.\n"
             "Then provide 5 comma-separated tags.\n\n"
             f"Original: {text}\n\n"
@@ -87,19 +421,15 @@ class AIService:
             "Line 1: Enhanced description\n"
             "Line 2: tag1,tag2,tag3,tag4,tag5"
         )
-        
-        try:
-            response = self.model.generate_content(prompt)
-            result = (response.text or "").strip()
-            
-            lines = result.split('\n', 1)
-            if len(lines) >= 2:
-                return lines[0].strip(), lines[1].strip()
-            else:
-                return result, ""
-        except Exception as e:
-            st.warning(f"AI processing failed: {e}")
-            return text, ""
+    
+    def _split_full_ai_reply(self, result):
+        """Two-line reply -> (description, tags)"""
+        result = result.strip()
+        lines = result.split('\n', 1)
+        if len(lines) >= 2:
+            return lines[0].strip(), lines[1].strip()
+        else:
+            return result, ""
     
     def _generate_tags(self, text):
         """Generate tags from text"""
@@ -114,7 +444,49 @@ class AIService:
         )
         
         try:
-            response = self.model.generate_content(prompt)
-            return (response.text or "").strip()
+            return self._generate(prompt, "tags").strip()
         except Exception as e:
-            return ""
\ No newline at end of file
+            return ""
+    
+    def _generate(self, prompt, kind, cache_lookup=True):
+        """Model call that answers from the persistent cache when the same request was made before
+        
+        cache_lookup=False is for callers that already missed the cache for this prompt.
+        """
+        key = AICache.make_key(GEMINI_MODEL_NAME, kind, prompt)
+        cached = self.cache.get(key) if cache_lookup else None
+        if cached is not None:
+            return cached
+        
+        response = self._call_model(prompt, kind)
+        text = response.text or ""
+        self.cache.set(key, text)
+        return text
+    
+    def _call_model(self, prompt, kind):
+        """generate_content within the rate limits, retrying rate-limit and server errors with backoff"""
+        for attempt in range(AI_RETRY_ATTEMPTS + 1):
+            # The reply is budgeted at about the prompt's size
+            self.rate_limiter.acquire(self._estimate_tokens(prompt) * 2)
+            started = time.perf_counter()
+            try:
+                response = self.model.generate_content(prompt, request_options={"timeout": AI_REQUEST_TIMEOUT})
+                self.usage.record_response(kind, prompt, response, time.perf_counter() - started)
+                return response
+            except Exception as e:
+                retrying = attempt < AI_RETRY_ATTEMPTS and self._is_retryable(e)
+                self.usage.record_error(retried=retrying)
+                if not retrying:
+                    raise
+                # Exponential backoff with full jitter
+                delay = min(AppSettings.AI_RETRY_MAX_DELAY, AppSettings.AI_RETRY_BASE_DELAY * 2 ** attempt)
+                self.rate_limiter.sleep(random.uniform(0, delay))
+    
+    def _is_retryable(self, error):
+        """Rate limits (429), server errors (5xx), timeouts and dropped connections"""
+        if isinstance(error, (TimeoutError, ConnectionError)):
+            return True
+        code = getattr(error, 'code', None)
+        if not isinstance(code, int):
+            code = getattr(error, 'status_code', None)
+        return code in self.RETRYABLE_STATUS_CODES
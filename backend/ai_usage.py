@@ -0,0 +1,88 @@
+# backend/ai_usage.py - Token, latency and cost accounting for AI calls
+import threading
+import time
+from config.constants import GEMINI_MODEL_NAME
+from config.settings import AppSettings
+
+class AIUsageTracker:
+    """Per-job record of model calls, safe to share between worker threads"""
+    
+    def __init__(self, model_name=GEMINI_MODEL_NAME):
+        self.model_name = model_name
+        self.started = time.time()
+        self.calls = []
+        self.errors = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def estimate_tokens(text):
+        """Rough token count when the backend reports none - about 4 characters per token"""
+        return max(1, len(text or "") // 4)
+    
+    def record_response(self, kind, prompt, response, latency):
+        """Record one successful call, taking token counts from the response's usage metadata if present"""
+        usage = getattr(response, "usage_metadata", None)
+        prompt_tokens = getattr(usage, "prompt_token_count", None)
+        response_tokens = getattr(usage, "candidates_token_count", None)
+        estimated = not isinstance(prompt_tokens, int) or not isinstance(response_tokens, int)
+        if estimated:
+            prompt_tokens = self.estimate_tokens(prompt)
+            response_tokens = self.estimate_tokens(getattr(response, "text", ""))
+        else:
+            # Thinking models bill their reasoning as output
+            thoughts = getattr(usage, "thoughts_token_count", None)
+            response_tokens += thoughts if isinstance(thoughts, int) else 0
+        
+        with self._lock:
+            self.calls.append({'kind': kind, 'prompt_tokens': prompt_tokens, 'response_tokens': response_tokens,
+                               'latency': latency, 'estimated': estimated})
+    
+    def record_error(self, retried=False):
+        """Count a failed attempt (it is retried or reported, and not billed)"""
+        with self._lock:
+            self.errors += 1
+            if retried:
+                self.retries += 1
+    
+    def summary(self):
+        """Totals overall and per call kind, with the estimated cost in USD"""
+        with self._lock:
+            calls = list(self.calls)
+            errors = self.errors
+            retries = self.retries
+        
+        by_kind = {}
+        for call in calls:
+            stats = by_kind.setdefault(call['kind'], {'calls': 0, 'prompt_tokens': 0, 'response_tokens': 0,
+                                                      'latencies': []})
+            stats['calls'] += 1
+            stats['prompt_tokens'] += call['prompt_tokens']
+            stats['response_tokens'] += call['response_tokens']
+            stats['latencies'].append(call['latency'])
+        for stats in by_kind.values():
+            latencies = sorted(stats.pop('latencies'))
+            stats['avg_latency'] = round(sum(latencies) / len(latencies), 3)
+            stats['p95_latency'] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3)
+            stats['cost_usd'] = self._cost(stats['prompt_tokens'], stats['response_tokens'])
+        
+        prompt_tokens = sum(call['prompt_tokens'] for call in calls)
+        response_tokens = sum(call['response_tokens'] for call in calls)
+        return {
+            'model': self.model_name,
+            'started': time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            'wall_seconds': round(time.time() - self.started, 3),
+            'calls': len(calls),
+            'errors': errors,
+            'retries': retries,
+            'prompt_tokens': prompt_tokens,
+            'response_tokens': response_tokens,
+            'estimated_tokens': any(call['estimated'] for call in calls),
+            'cost_usd': self._cost(prompt_tokens, response_tokens),
+            'by_kind': by_kind,
+        }
+    
+    def _cost(self, prompt_tokens, response_tokens):
+        """USD at the configured per-million-token prices"""
+        return round(prompt_tokens / 1e6 * AppSettings.AI_INPUT_COST_PER_MILLION_TOKENS
+                     + response_tokens / 1e6 * AppSettings.AI_OUTPUT_COST_PER_MILLION_TOKENS, 6)
@@ -1,7 +1,12 @@
 # backend/data_processor.py - FIXED: Blank compare price handling + paragraph tag fix
+import hashlib
+import numpy as np
 import pandas as pd
 import streamlit as st
-from helpers.utils import get_column_value, clean_value, sort_sizes_with_quantities
+from config.constants import SHOPIFY_EXPORT_COLUMNS
+from helpers.utils import (get_column_series, clean_series,
+                           clean_numeric_series, fallback_series, parse_size_and_quantity,
+                           size_sort_key, sort_sizes_with_quantities)
 
 class DataProcessor:
     """Enhanced data processing service with latest Shopify format support"""
@@ -17,66 +22,63 @@ class DataProcessor:
         return df_with_handles
     
     def initialize_variants(self, df, column_mapping, config):
-        """FIXED: Initialize variant management with proper default_qty from config"""
-        unique_variants = []
-        variant_products = {}
-        extracted_quantities = {}
-        extracted_compare_prices = {}
+        """FIXED: Initialize variant management with proper default_qty from config
         
+        The variant index is memoized in session state by a fingerprint of the
+        processed data, so reruns that only edit quantities skip the rescan.
+        """
         # FIXED: Get the current default_qty from config (not session state)
         current_default_qty = config.get('default_qty', 10)
         
-        for _, row in df.iterrows():
-            size = clean_value(row.get('sizes_list', ''))
-            color = clean_value(row.get('colours_list', ''))
-            title = clean_value(get_column_value(row, column_mapping, 'Title', 'Unknown'))
-            
+        stats = st.session_state.setdefault('variant_index_stats', {'hits': 0, 'rebuilds': 0})
+        fingerprint = self._variant_fingerprint(df, column_mapping, current_default_qty)
+        if self._variant_index_is_current(fingerprint):
+            stats['hits'] += 1
+            return
+        
+        variants = pd.DataFrame({
+            'size': self._clean_text_column(df, 'sizes_list'),
+            'color': self._clean_text_column(df, 'colours_list'),
+            'title': clean_series(get_column_series(df, column_mapping, 'Title', 'Unknown')).to_numpy(dtype=object),
             # Extract quantity from size (e.g., "M-5" means 5 quantity)
-            extracted_qty = row.get('extracted_quantity', 0)
-            
+            'extracted_qty': df['extracted_quantity'].to_numpy(dtype=object) if 'extracted_quantity' in df.columns else 0,
             # FIXED: Handle blank compare prices properly
-            extracted_compare_price = row.get('uploaded_compare_price', None)
-            
-            variant_key = (size, color, title)
-            variant_key_str = f"{size}|{color}|{title}"
-            
-            if variant_key not in unique_variants:
-                unique_variants.append(variant_key)
-                variant_products[variant_key] = title
-                extracted_quantities[variant_key_str] = extracted_qty
-                # FIXED: Store None if no compare price (not default)
-                extracted_compare_prices[variant_key_str] = extracted_compare_price
+            'compare_price': df['uploaded_compare_price'].to_numpy(dtype=object) if 'uploaded_compare_price' in df.columns else None,
+        })
+        
+        # First occurrence of each (size, color, title) wins, in data order
+        first_variants = variants.drop_duplicates(subset=['size', 'color', 'title'], keep='first')
+        sizes, colors, titles = (first_variants[col].tolist() for col in ('size', 'color', 'title'))
+        
+        unique_variants = list(zip(sizes, colors, titles))
+        variant_products = dict(zip(unique_variants, titles))
+        variant_key_strs = [f"{size}|{color}|{title}" for size, color, title in unique_variants]
+        extracted_quantities = dict(zip(variant_key_strs, first_variants['extracted_qty'].tolist()))
+        # FIXED: Store None if no compare price (not default)
+        extracted_compare_prices = dict(zip(variant_key_strs, first_variants['compare_price'].tolist()))
         
         # Store in session state
         st.session_state.unique_variants = unique_variants
         st.session_state.variant_products = variant_products
         
-        # FIXED: Initialize quantity mappings with current default_qty from config
+        # FIXED: Initialize quantity and compare price mappings with current default_qty from config
         if 'variant_quantities' not in st.session_state:
             st.session_state.variant_quantities = {}
-        
-        # Update all quantities - use extracted if available, otherwise use current default_qty
-        for size, color, title in unique_variants:
-            variant_key = f"{size}|{color}|{title}"
-            extracted_qty = extracted_quantities.get(variant_key, 0)
-            
-            # If variant not yet in session, initialize it
-            if variant_key not in st.session_state.variant_quantities:
-                # Use extracted quantity if > 0, otherwise use current default_qty from config
-                st.session_state.variant_quantities[variant_key] = extracted_qty if extracted_qty > 0 else current_default_qty
-        
-        # FIXED: Initialize compare price mappings - keep blank if source is blank
         if 'variant_compare_prices' not in st.session_state:
             st.session_state.variant_compare_prices = {}
+        variant_quantities = st.session_state.variant_quantities
+        variant_compare_prices = st.session_state.variant_compare_prices
         
-        for size, color, title in unique_variants:
-            variant_key = f"{size}|{color}|{title}"
-            
+        for variant_key in variant_key_strs:
             # If variant not yet in session, initialize it
-            if variant_key not in st.session_state.variant_compare_prices:
-                extracted_price = extracted_compare_prices.get(variant_key, None)
-                # FIXED: Store None if blank, not default value
-                st.session_state.variant_compare_prices[variant_key] = extracted_price
+            if variant_key not in variant_quantities:
+                # Use extracted quantity if > 0, otherwise use current default_qty from config
+                extracted_qty = extracted_quantities.get(variant_key, 0)
+                variant_quantities[variant_key] = extracted_qty if extracted_qty > 0 else current_default_qty
+            
+            # FIXED: Store None if blank, not default value - keep blank if source is blank
+            if variant_key not in variant_compare_prices:
+                variant_compare_prices[variant_key] = extracted_compare_prices.get(variant_key, None)
         
         # Store extracted quantities for UI display
         st.session_state.extracted_quantities = extracted_quantities
@@ -84,6 +86,41 @@ class DataProcessor:
         
         # IMPORTANT: Store the config default_qty so UI can show it
         st.session_state.config_default_qty = current_default_qty
+        
+        st.session_state.variant_index_cache = {
+            'fingerprint': fingerprint,
+            'unique_variants': unique_variants,
+            'variant_quantities': variant_quantities,
+            'variant_compare_prices': variant_compare_prices,
+        }
+        stats['rebuilds'] += 1
+    
+    def _variant_fingerprint(self, df, column_mapping, default_qty):
+        """Cheap fingerprint of the columns and settings the variant index depends on"""
+        title_column = column_mapping.get('Title')
+        key_columns = [col for col in ('sizes_list', 'colours_list', title_column,
+                                       'extracted_quantity', 'uploaded_compare_price')
+                       if col and col in df.columns]
+        row_hashes = pd.util.hash_pandas_object(df[key_columns], index=False).to_numpy()
+        digest = hashlib.sha1(row_hashes.tobytes()).hexdigest()
+        return (df.shape, tuple(key_columns), digest, title_column, default_qty)
+    
+    def _variant_index_is_current(self, fingerprint):
+        """Check the cached variant index still matches the data and the session maps"""
+        cache = st.session_state.get('variant_index_cache')
+        if not cache or cache['fingerprint'] != fingerprint:
+            return False
+        
+        # Session maps that were cleared or replaced need a rebuild
+        return (st.session_state.get('unique_variants') is cache['unique_variants']
+                and st.session_state.get('variant_quantities') is cache['variant_quantities']
+                and st.session_state.get('variant_compare_prices') is cache['variant_compare_prices'])
+    
+    def _clean_text_column(self, df, column):
+        """Cleaned text values of an optional column - blank if the column is missing"""
+        if column not in df.columns:
+            return np.full(len(df), '', dtype=object)
+        return clean_series(df[column]).to_numpy(dtype=object)
     
     def generate_shopify_csv(self, df, column_mapping, config):
         """Generate final Shopify CSV with LATEST format including all metafields"""
@@ -96,25 +133,14 @@ class DataProcessor:
         # Apply variant mappings to dataframe
         self._apply_variant_mappings(df, column_mapping, current_config)
         
-        # Generate Shopify format
-        grouped_data = []
+        # Order rows: products by handle, variants sorted within each product
+        df_sorted = self._sort_variants(df)
         
-        for handle, group in df.groupby("Handle"):
-            sorted_group = self._sort_variants_in_group(group)
-            
-            for idx, row in enumerate(sorted_group):
-                if idx == 0:
-                    # Main product row
-                    grouped_data.append(self._create_main_product_row(row, column_mapping, current_config))
-                else:
-                    # Variant rows
-                    grouped_data.append(self._create_variant_row(row, column_mapping, handle, current_config))
-        
-        # Create final dataframe with EXACT column order
-        shopify_df = pd.DataFrame(grouped_data)
+        # First row of each handle is the main product row, the rest are variant rows
+        is_main_row = (df_sorted.groupby("Handle", sort=False).cumcount() == 0).to_numpy()
         
-        # Reorder columns to match exact Shopify format
-        shopify_df = self._reorder_columns_to_shopify_format(shopify_df)
+        # Build each Shopify column at once, already in EXACT column order
+        shopify_df = self._build_shopify_columns(df_sorted, is_main_row, column_mapping, current_config)
         
         # FIXED: Clean up data - keep blank compare prices as blank
         for col in shopify_df.columns:
@@ -129,184 +155,230 @@ class DataProcessor:
         
         return shopify_df
     
-    def _reorder_columns_to_shopify_format(self, df):
-        """Reorder columns to match exact Shopify format"""
-        # Exact column order from Shopify format
-        column_order = [
-            "Handle", "Title", "Body (HTML)", "Vendor", "Product Category", "Type", "Tags", "Published",
-            "Option1 Name", "Option1 Value", "Option1 Linked To",
-            "Option2 Name", "Option2 Value", "Option2 Linked To",
-            "Option3 Name", "Option3 Value", "Option3 Linked To",
-            "Variant SKU", "Variant Grams", "Variant Inventory Tracker", "Variant Inventory Qty",
-            "Variant Inventory Policy", "Variant Fulfillment Service", "Variant Price", "Variant Compare At Price",
-            "Variant Requires Shipping", "Variant Taxable",
-            "Unit Price Total Measure", "Unit Price Total Measure Unit",
-            "Unit Price Base Measure", "Unit Price Base Measure Unit",
-            "Variant Barcode",
-            "Image Src", "Image Position", "Image Alt Text", "Gift Card",
-            "SEO Title", "SEO Description",
-            "Google Shopping / Google Product Category", "Google Shopping / Gender", "Google Shopping / Age Group",
-            "Google Shopping / MPN", "Google Shopping / Condition", "Google Shopping / Custom Product",
-            "Google Shopping / Custom Label 0", "Google Shopping / Custom Label 1", "Google Shopping / Custom Label 2",
-            "Google Shopping / Custom Label 3", "Google Shopping / Custom Label 4",
-            # Metafields
-            "Gender (product.metafields.custom.gender)",
-            "Google: Custom Product (product.metafields.mm-google-shopping.custom_product)",
-            "Age group (product.metafields.shopify.age-group)",
-            "Color (product.metafields.shopify.color-pattern)",
-            "Dress occasion (product.metafields.shopify.dress-occasion)",
-            "Dress style (product.metafields.shopify.dress-style)",
-            "Fabric (product.metafields.shopify.fabric)",
-            "Neckline (product.metafields.shopify.neckline)",
-            "Size (product.metafields.shopify.size)",
-            "Skirt/Dress length type (product.metafields.shopify.skirt-dress-length-type)",
-            "Sleeve length type (product.metafields.shopify.sleeve-length-type)",
-            "Target gender (product.metafields.shopify.target-gender)",
-            "Complementary products (product.metafields.shopify--discovery--product_recommendation.complementary_products)",
-            "Related products (product.metafields.shopify--discovery--product_recommendation.related_products)",
-            "Related products settings (product.metafields.shopify--discovery--product_recommendation.related_products_display)",
-            "Search product boosts (product.metafields.shopify--discovery--product_search_boost.queries)",
-            "Variant Image", "Variant Weight Unit", "Variant Tax Code", "Cost per item", "Status"
-        ]
-        
-        # Add missing columns with empty values
-        for col in column_order:
-            if col not in df.columns:
-                df[col] = ""
-        
-        # Return dataframe with exact column order
-        return df[column_order]
-    
     def _process_variants(self, df_raw, column_mapping, config):
-        """Process variants and extract inventory data with enhanced configuration support"""
-        df_exploded_list = []
-        
-        for _, row in df_raw.iterrows():
-            # Use both old and new field names for compatibility
-            sizes_value = (get_column_value(row, column_mapping, 'Option1 Value', '') or 
-                          get_column_value(row, column_mapping, 'size', ''))
-            colours_value = (get_column_value(row, column_mapping, 'Option2 Value', '') or 
-                           get_column_value(row, column_mapping, 'colour', ''))
-            
-            sorted_sizes, size_quantity_map = sort_sizes_with_quantities(clean_value(sizes_value))
-            colors = [c.strip() for c in str(clean_value(colours_value)).split(",") if c.strip()]
-            
-            # FIXED: Extract compare price - handle blank properly
-            uploaded_compare_price = self._extract_compare_price(row, column_mapping, config)
-            
-            # Create default entries if no sizes or colors
-            if not sorted_sizes:
-                sorted_sizes = [""]
-                size_quantity_map = {"": 0}
-            if not colors:
-                colors = [""]
-            
-            # Create all combinations
-            for size in sorted_sizes:
-                for color in colors:
-                    new_row = row.copy()
-                    
-                    # For descriptions, only use the size part before '-' (e.g., "M-5" becomes "M")
-                    display_size = size.split('-')[0].strip() if size and '-' in size else size
-                    new_row["sizes_list"] = size  # Keep full size for inventory
-                    new_row["display_size"] = display_size  # Size for descriptions
-                    new_row["colours_list"] = color
-                    
-                    # Extract quantity based on configuration
-                    extracted_qty = self._extract_quantity(size, size_quantity_map, config)
-                    new_row["extracted_quantity"] = extracted_qty
-                    
-                    # FIXED: Store None for blank compare prices
-                    new_row["uploaded_compare_price"] = uploaded_compare_price
-                    
-                    df_exploded_list.append(new_row)
-        
-        return pd.DataFrame(df_exploded_list)
+        """Process variants and extract inventory data with enhanced configuration support
+
+        Every source row is exploded into one row per size x colour combination.
+        Size and colour strings are parsed once per distinct value and the
+        combinations are built with a cross join on the source row position.
+        """
+        if df_raw.empty:
+            return pd.DataFrame()
+        
+        # Use both old and new field names for compatibility
+        sizes_value = fallback_series(get_column_series(df_raw, column_mapping, 'Option1 Value', ''),
+                                      get_column_series(df_raw, column_mapping, 'size', ''))
+        colours_value = fallback_series(get_column_series(df_raw, column_mapping, 'Option2 Value', ''),
+                                        get_column_series(df_raw, column_mapping, 'colour', ''))
+        sizes_text = clean_series(sizes_value)
+        colours_text = clean_series(colours_value)
+        
+        # Parse each distinct size/colour string once
+        parsed_sizes = {value: self._parse_sizes(value) for value in sizes_text.unique()}
+        parsed_colours = {value: self._parse_colours(value) for value in colours_text.unique()}
+        
+        positions = np.arange(len(df_raw))
+        size_frame = pd.DataFrame({
+            '_pos': positions,
+            'sizes_list': [parsed_sizes[value][0] for value in sizes_text],
+            '_size_qty': [parsed_sizes[value][1] for value in sizes_text],
+        }).explode(['sizes_list', '_size_qty'])
+        colour_frame = pd.DataFrame({
+            '_pos': positions,
+            'colours_list': colours_text.map(parsed_colours).to_numpy(),
+        }).explode('colours_list')
+        
+        # Create all combinations - sizes outer, colours inner, in source row order
+        combos = size_frame.merge(colour_frame, on='_pos', how='inner', sort=False)
+        
+        df_exploded = df_raw.iloc[combos['_pos'].to_numpy()].copy()
+        
+        sizes = combos['sizes_list'].astype(object).to_numpy()
+        sizes_series = pd.Series(sizes, dtype=object)
+        has_dash = sizes_series.str.contains('-', regex=False).to_numpy(dtype=bool)
+
+        # For descriptions, only use the size part before '-' (e.g., "M-5" becomes "M")
+        display_sizes = sizes.copy()
+        display_sizes[has_dash] = sizes_series[has_dash].str.split('-').str[0].str.strip().to_numpy()
+
+        df_exploded["sizes_list"] = sizes  # Keep full size for inventory
+        df_exploded["display_size"] = display_sizes  # Size for descriptions
+        df_exploded["colours_list"] = combos['colours_list'].astype(object).to_numpy()
+        
+        # Extract quantity based on configuration
+        size_quantities = combos['_size_qty'].astype('int64').to_numpy()
+        df_exploded["extracted_quantity"] = self._extract_quantities(size_quantities, config)
+        
+        # FIXED: Store None for blank compare prices
+        compare_prices = self._extract_compare_prices(df_raw, column_mapping, config)
+        df_exploded["uploaded_compare_price"] = compare_prices[combos['_pos'].to_numpy()]
+        
+        return df_exploded.infer_objects()
+    
+    def _parse_sizes(self, sizes_value):
+        """Parse a size string into sorted sizes and their quantities"""
+        sorted_sizes, size_quantity_map = sort_sizes_with_quantities(sizes_value)
+        
+        # Create default entry if no sizes
+        if not sorted_sizes:
+            return [""], [0]
+        return sorted_sizes, [size_quantity_map.get(size, 0) for size in sorted_sizes]
+    
+    def _parse_colours(self, colours_value):
+        """Split a comma-separated colour string"""
+        colors = [c.strip() for c in str(colours_value).split(",") if c.strip()]
+        
+        # Create default entry if no colors
+        return colors or [""]
     
-    def _extract_quantity(self, size, size_quantity_map, config):
-        """Extract quantity based on configuration settings"""
+    def _extract_quantities(self, size_quantities, config):
+        """Extract quantities based on configuration settings"""
         if config.get('bulk_qty_mode', False):
-            return config.get('bulk_qty', 10)
+            return np.full(len(size_quantities), config.get('bulk_qty', 10))
         
         if config.get('use_expected_qty', True):
-            extracted_qty = size_quantity_map.get(size, 0)
-            if extracted_qty > 0:
-                return extracted_qty
-            else:
-                return config.get('fallback_qty', config.get('default_qty', 10))
+            fallback_qty = config.get('fallback_qty', config.get('default_qty', 10))
+            return np.where(size_quantities > 0, size_quantities, fallback_qty)
         
-        return config.get('default_qty', 10)
+        return np.full(len(size_quantities), config.get('default_qty', 10))
     
-    def _extract_compare_price(self, row, column_mapping, config):
-        """FIXED: Extract compare price - return None for blank values"""
+    def _extract_compare_prices(self, df_raw, column_mapping, config):
+        """FIXED: Extract compare price per source row - None for blank values"""
         if config.get('bulk_compare_price_mode', False):
-            return config.get('bulk_compare_price', 0.0)
+            return np.full(len(df_raw), config.get('bulk_compare_price', 0.0), dtype=object)
         
-        if config.get('use_expected_compare_price', True):
-            compare_price_value = get_column_value(row, column_mapping, 'Variant Compare At Price')
-            
-            # FIXED: Check if value exists and is not blank
-            if compare_price_value and pd.notna(compare_price_value) and str(compare_price_value).strip() != '':
-                try:
-                    numeric_value = float(str(compare_price_value).strip())
-                    if numeric_value >= 0:
-                        return numeric_value
-                except (ValueError, TypeError):
-                    pass
-            
-            # FIXED: Return None for blank, not default
-            return None
+        if not config.get('use_expected_compare_price', True):
+            return np.full(len(df_raw), config.get('default_compare_price', 0.0), dtype=object)
+        
+        values = get_column_series(df_raw, column_mapping, 'Variant Compare At Price').astype(object)
+        text = values.astype(str).str.strip()
         
-        return config.get('default_compare_price', 0.0)
+        # FIXED: Check if value exists and is not blank
+        is_present = values.to_numpy(dtype=object).astype(bool) & values.notna() & (text != '')
+        numeric = pd.to_numeric(text.where(is_present), errors='coerce')
+        is_valid = is_present & (numeric >= 0)
+        
+        # FIXED: Return None for blank, not default
+        return np.where(is_valid, numeric.astype(object), None)
     
     def _apply_size_surcharges(self, df, column_mapping, config):
-        """Apply size-based surcharges to variant prices"""
+        """Apply size-based surcharges to variant prices
+        
+        Rules are keyed by size ("XL": 0.1) or by a size tier (">=XL": 0.15,
+        "<=XS": 0.05). An exact size rule wins over tiers; when several tiers
+        match, the one listed last wins. Prices that are not positive are left
+        as they are.
+        """
         if not config.get('enable_surcharge', False):
             return df
         
-        def apply_surcharge(row):
-            base_price = clean_value(get_column_value(row, column_mapping, 'Variant Price', 0), is_numeric=True)
-            
-            if base_price <= 0:
-                return base_price
-            
-            size = row.get('display_size', '').strip().upper()
-            
-            if config.get('bulk_surcharge_mode', False):
-                surcharge_percent = config.get('bulk_surcharge_percent', 0) / 100.0
-                return base_price * (1 + surcharge_percent)
-            else:
-                surcharge_rules = config.get('surcharge_rules', {})
-                if size in surcharge_rules:
-                    surcharge_percent = surcharge_rules[size]
-                    return base_price * (1 + surcharge_percent)
-            
-            return base_price
+        base_price = clean_numeric_series(get_column_series(df, column_mapping, 'Variant Price', 0)).to_numpy(dtype=float)
         
-        df['final_variant_price'] = df.apply(apply_surcharge, axis=1)
+        if config.get('bulk_surcharge_mode', False):
+            surcharge_percent = config.get('bulk_surcharge_percent', 0) / 100.0
+            surcharge = np.full(len(df), surcharge_percent)
+        else:
+            sizes = df['display_size'] if 'display_size' in df.columns else pd.Series('', index=df.index)
+            surcharge = self._size_surcharge_percents(sizes, config.get('surcharge_rules', {}))
+        
+        df['final_variant_price'] = np.where(base_price > 0, base_price * (1 + surcharge), base_price)
         return df
     
+    def _size_surcharge_percents(self, sizes, surcharge_rules):
+        """Surcharge fraction per row - each distinct size is resolved against the rules once"""
+        codes, unique_sizes = pd.factorize(sizes.astype(str).str.strip().str.upper(), use_na_sentinel=False)
+        percents = np.zeros(len(unique_sizes))
+        if not surcharge_rules or not len(unique_sizes):
+            return percents[codes] if len(codes) else np.zeros(0)
+        
+        # Precomputed size rank per distinct size, comparable within standard / numeric sizes
+        size_ranks = [size_sort_key(size) for size in unique_sizes]
+        
+        for rule, percent in surcharge_rules.items():
+            tier = self._parse_surcharge_tier(rule)
+            if tier is None:
+                continue
+            operator, threshold = tier
+            in_tier = np.array([
+                rank[0] == threshold[0] and rank[0] < 2 and
+                (rank >= threshold if operator == '>=' else rank <= threshold)
+                for rank in size_ranks
+            ])
+            percents[in_tier] = percent
+        
+        # Exact size rules override any tier
+        for index, size in enumerate(unique_sizes):
+            if size in surcharge_rules:
+                percents[index] = surcharge_rules[size]
+        
+        return percents[codes]
+    
+    def _parse_surcharge_tier(self, rule):
+        """Split a tier rule like '>=XL' into ('>=', size rank) - None for plain size rules"""
+        rule = str(rule).replace(' ', '').upper()
+        for operator in ('>=', '<='):
+            if rule.startswith(operator) and len(rule) > len(operator):
+                threshold = size_sort_key(rule[len(operator):])
+                # Custom sizes have no order to compare against
+                return (operator, threshold) if threshold[0] < 2 else None
+        return None
+    
     def _generate_handles(self, df, column_mapping):
-        """Generate Shopify handles"""
-        title_series = df.apply(lambda row: get_column_value(row, column_mapping, 'Title', 'Unknown'), axis=1)
-        product_code_series = df.apply(lambda row: (get_column_value(row, column_mapping, 'Variant SKU', '') or 
-                                                   get_column_value(row, column_mapping, 'product code', '')), axis=1)
+        """Generate Shopify handles
+        
+        Each distinct title/product code pair is slugified once. Different
+        products whose slugs collide get a "-2", "-3", ... suffix so they are
+        not merged into one Shopify product.
+        """
+        title_series = get_column_series(df, column_mapping, 'Title', 'Unknown')
+        product_code_series = fallback_series(get_column_series(df, column_mapping, 'Variant SKU', ''),
+                                              get_column_series(df, column_mapping, 'product code', ''))
         
-        df["Handle"] = (title_series.astype(str).fillna("").str.strip() + "-" + 
-                        product_code_series.fillna("").astype(str).str.strip())
+        raw_handles = (title_series.astype(str).fillna("").str.strip() + "-" + 
+                       product_code_series.fillna("").astype(str).str.strip())
         
-        df["Handle"] = (df["Handle"]
-                        .str.replace(r"[^\w\s-]", "", regex=True)
-                        .str.replace(r"\s+", "-", regex=True)
-                        .str.lower()
-                        .str.replace(r"-+", "-", regex=True)
-                        .str.strip("-"))
+        codes, unique_handles = pd.factorize(raw_handles, use_na_sentinel=False)
+        slugs = self._slugify_handles(pd.Series(unique_handles))
+        slugs = pd.Series(self._disambiguate_handles(unique_handles, slugs.tolist()), dtype=slugs.dtype)
         
+        df["Handle"] = slugs.take(codes).set_axis(df.index)
         return df
     
+    def _slugify_handles(self, handles):
+        """Lowercase, hyphenated handle slugs"""
+        return (handles
+                .str.replace(r"[^\w\s-]", "", regex=True)
+                .str.replace(r"\s+", "-", regex=True)
+                .str.lower()
+                .str.replace(r"-+", "-", regex=True)
+                .str.strip("-"))
+    
+    def _disambiguate_handles(self, raw_handles, slugs):
+        """Suffix slugs already taken by a different product - the first product keeps the plain slug
+        
+        Raw handles that only differ in case or spacing are the same product and share a handle.
+        """
+        taken = set(slugs)
+        assigned = set()
+        handle_by_product = {}
+        handles = []
+        for raw_handle, slug in zip(raw_handles, slugs):
+            product_key = " ".join(str(raw_handle).lower().split())
+            if product_key not in handle_by_product:
+                if slug and slug in assigned:
+                    suffix = 2
+                    while f"{slug}-{suffix}" in taken:
+                        suffix += 1
+                    slug = f"{slug}-{suffix}"
+                    taken.add(slug)
+                handle_by_product[product_key] = slug
+                assigned.add(slug)
+            handles.append(handle_by_product[product_key])
+        return handles
+    
     def _apply_variant_mappings(self, df, column_mapping, config):
         """Apply stored quantity and price mappings with enhanced configuration support"""
-        title_series = df.apply(lambda row: get_column_value(row, column_mapping, 'Title', 'Unknown'), axis=1)
+        title_series = get_column_series(df, column_mapping, 'Title', 'Unknown')
         df["_variant_key"] = (df["sizes_list"].astype(str).fillna("").str.strip() + "|" + 
                              df["colours_list"].astype(str).fillna("").str.strip() + "|" + 
                              title_series.astype(str).fillna("").str.strip())
@@ -316,254 +388,146 @@ class DataProcessor:
             bulk_qty = config.get('bulk_qty', 10)
             df["Variant Inventory Qty"] = bulk_qty
         elif 'variant_quantities' in st.session_state:
-            def get_quantity(variant_key):
-                return st.session_state.variant_quantities.get(variant_key, config.get('default_qty', 10))
-            df["Variant Inventory Qty"] = df["_variant_key"].apply(get_quantity)
-        else:
-            df["Variant Inventory Qty"] = df.apply(
-                lambda row: row.get('extracted_quantity', config.get('default_qty', 10)), axis=1
+            df["Variant Inventory Qty"] = self._lookup_variant_values(
+                df["_variant_key"], st.session_state.variant_quantities, config.get('default_qty', 10)
             )
+        elif 'extracted_quantity' in df.columns:
+            df["Variant Inventory Qty"] = df['extracted_quantity']
+        else:
+            df["Variant Inventory Qty"] = config.get('default_qty', 10)
         
         # FIXED: Apply compare price - keep None for blank values
         if config.get('bulk_compare_price_mode', False):
             bulk_compare_price = config.get('bulk_compare_price', 0.0)
             df["Variant Compare At Price"] = bulk_compare_price
         elif 'variant_compare_prices' in st.session_state:
-            def get_compare_price(variant_key):
-                price = st.session_state.variant_compare_prices.get(variant_key, None)
-                # FIXED: Return None if blank, not default
-                return price
-            df["Variant Compare At Price"] = df["_variant_key"].apply(get_compare_price)
-        else:
-            df["Variant Compare At Price"] = df.apply(
-                lambda row: row.get('uploaded_compare_price', None), axis=1
+            # FIXED: Return None if blank, not default
+            df["Variant Compare At Price"] = self._lookup_variant_values(
+                df["_variant_key"], st.session_state.variant_compare_prices, None
             )
+        elif 'uploaded_compare_price' in df.columns:
+            df["Variant Compare At Price"] = df['uploaded_compare_price']
+        else:
+            df["Variant Compare At Price"] = None
         
         df["Variant Inventory Qty"] = pd.to_numeric(df["Variant Inventory Qty"], errors='coerce').fillna(0).astype(int)
-        # FIXED: Keep None values as None for compare price
-        df["Variant Compare At Price"] = df["Variant Compare At Price"].apply(
-            lambda x: None if pd.isna(x) or x == '' else float(x) if x != 0 else None
-        )
+        # FIXED: Keep blank (NaN) for missing, blank or zero compare prices
+        compare_prices = pd.to_numeric(df["Variant Compare At Price"], errors='coerce')
+        df["Variant Compare At Price"] = compare_prices.where(compare_prices != 0).astype(float)
     
-    def _sort_variants_in_group(self, group):
-        """Sort variants within product group"""
-        sizes_in_group = group['sizes_list'].unique()
-        sorted_sizes_for_group, _ = sort_sizes_with_quantities(','.join(sizes_in_group)) if len(sizes_in_group) > 0 else ([], {})
-        
-        size_order_map = {size: idx for idx, size in enumerate(sorted_sizes_for_group)}
-        
-        def sort_key(row):
-            size = row['sizes_list']
-            color = row['colours_list']
-            size_idx = size_order_map.get(size, 999)
-            return (size_idx, color)
-        
-        group_list = list(group.iterrows())
-        group_list.sort(key=lambda x: sort_key(x[1]))
-        return [row for _, row in group_list]
+    def _lookup_variant_values(self, variant_keys, values_by_key, default):
+        """Map variant keys through a stored {variant_key: value} dict, with a default for unknown keys"""
+        lookup = pd.Series(values_by_key, dtype=object)
+        positions = lookup.index.get_indexer(variant_keys)
+        values = np.where(positions >= 0, lookup.to_numpy()[positions], default) if len(lookup) else default
+        return pd.Series(values, index=variant_keys.index, dtype=object)
     
-    def _create_main_product_row(self, row, column_mapping, config):
-        """Create main product row with ALL new Shopify fields and metafields"""
-        display_size = clean_value(row.get("display_size", ""))
-        has_sizes = bool(display_size)
-        has_colors = bool(clean_value(row.get("colours_list", "")))
+    def _sort_variants(self, df):
+        """Sort variants by handle, size order and colour in a single stable sort"""
+        df = df[df["Handle"].notna()]
+        
+        # Rank each distinct size once - sizes that do not parse back to themselves go last
+        size_codes, unique_sizes = pd.factorize(df["sizes_list"].astype(object), use_na_sentinel=False)
+        size_keys = [size_sort_key(size) if size and parse_size_and_quantity(size)[0] == size else None
+                     for size in unique_sizes]
+        key_ranks = {key: rank for rank, key in enumerate(sorted({key for key in size_keys if key is not None}))}
+        unranked = len(key_ranks)
+        size_ranks = np.array([key_ranks.get(key, unranked) for key in size_keys], dtype=np.int64)
+        
+        # Equal-ranked sizes within a product (e.g. "S" and "s") keep their first-seen order
+        first_seen = df.groupby(["Handle", "sizes_list"], sort=False).ngroup().to_numpy()
+        size_rank = size_ranks[size_codes] if len(size_codes) else np.array([], dtype=np.int64)
+        
+        sort_frame = pd.DataFrame({
+            "Handle": df["Handle"].to_numpy(),
+            "_size_rank": size_rank,
+            "_size_seen": np.where(size_rank == unranked, 0, first_seen),
+            "_colour": df["colours_list"].to_numpy(),
+        })
+        order = sort_frame.sort_values(["Handle", "_size_rank", "_size_seen", "_colour"], kind="stable").index
+        return df.iloc[order.to_numpy()]
+    
+    def _build_shopify_columns(self, df, is_main_row, column_mapping, config):
+        """Build the Shopify frame column by column - main rows carry the product fields"""
+        row_count = len(df)
+        
+        def constant(value):
+            return np.full(row_count, value, dtype=object)
+        
+        def main_only(values):
+            return np.where(is_main_row, np.asarray(values, dtype=object), "")
+        
+        def text(standard_name, default=''):
+            return clean_series(get_column_series(df, column_mapping, standard_name, default)).to_numpy(dtype=object)
+        
+        display_size = clean_series(df["display_size"]).to_numpy(dtype=object)
+        colours = clean_series(df["colours_list"]).to_numpy(dtype=object)
         
         # Get body HTML - prioritize enhanced description
-        body_html = ""
-        if 'enhanced_description' in row.index and pd.notna(row['enhanced_description']):
-            body_html = str(row['enhanced_description'])
-        elif 'enhanced_body' in row.index and pd.notna(row['enhanced_body']):
-            body_html = str(row['enhanced_body'])
-        else:
-            description = clean_value(get_column_value(row, column_mapping, 'Body (HTML)', ''))
-            if description:
-                body_html = f"<p>{description}</p>"
+        description = clean_series(get_column_series(df, column_mapping, 'Body (HTML)', ''))
+        body_html = description.where(description == '', '<p>' + description + '</p>')
+        for body_column in ('enhanced_body', 'enhanced_description'):
+            if body_column in df.columns:
+                body_html = df[body_column].astype(object).astype(str).where(df[body_column].notna(), body_html)
+        
+        published = clean_series(get_column_series(df, column_mapping, 'published', '')).str.lower() == "active"
+        tags = clean_series(df["ai_tags"]).to_numpy(dtype=object) if "ai_tags" in df.columns else constant("")
+        
+        variant_sku = clean_series(fallback_series(get_column_series(df, column_mapping, 'Variant SKU', ''),
+                                                   get_column_series(df, column_mapping, 'product code', '')))
         
         # Use final price with surcharges if available
-        variant_price = row.get('final_variant_price', get_column_value(row, column_mapping, 'Variant Price', 0))
-        variant_price = clean_value(variant_price, is_numeric=True)
+        if 'final_variant_price' in df.columns:
+            variant_price = clean_numeric_series(df['final_variant_price'])
+        else:
+            variant_price = clean_numeric_series(get_column_series(df, column_mapping, 'Variant Price', 0))
         
         # FIXED: Handle blank compare prices
-        compare_price = row.get("Variant Compare At Price", None)
-        if pd.isna(compare_price) or compare_price == '' or compare_price == 0:
-            compare_price = ''
+        compare_price = clean_numeric_series(df["Variant Compare At Price"])
+        compare_blank = df["Variant Compare At Price"].isna() | (compare_price == 0)
+        
+        if "Variant Inventory Qty" in df.columns:
+            inventory_qty = clean_numeric_series(df["Variant Inventory Qty"])
         else:
-            compare_price = clean_value(compare_price, is_numeric=True)
+            inventory_qty = constant(0)
         
-        return {
+        columns = {
             # Core Product Fields
-            "Handle": clean_value(row.get("Handle", "")),
-            "Title": clean_value(get_column_value(row, column_mapping, 'Title', 'Unknown')),
-            "Body (HTML)": body_html,
-            "Vendor": config.get('vendor_name', 'YourBrandName'),
-            "Product Category": clean_value(get_column_value(row, column_mapping, 'Product Category', '')),
-            "Type": clean_value(get_column_value(row, column_mapping, 'Type', '')),
-            "Tags": clean_value(row.get("ai_tags", "")),
-            "Published": "TRUE" if str(clean_value(get_column_value(row, column_mapping, 'published', ''))).lower() == "active" else "FALSE",
+            "Handle": clean_series(df["Handle"]).to_numpy(dtype=object),
+            "Title": main_only(text('Title', 'Unknown')),
+            "Body (HTML)": main_only(body_html),
+            "Vendor": main_only(constant(config.get('vendor_name', 'YourBrandName'))),
+            "Product Category": main_only(text('Product Category')),
+            "Type": main_only(text('Type')),
+            "Tags": main_only(tags),
+            "Published": main_only(np.where(published, "TRUE", "FALSE")),
             
-            # Options with Linked To fields
-            "Option1 Name": "Size" if has_sizes else "",
+            # Options - names only on the main product row
+            "Option1 Name": main_only(np.where(display_size != "", "Size", "")),
             "Option1 Value": display_size,
-            "Option1 Linked To": "",
-            "Option2 Name": "Color" if has_colors else "",
-            "Option2 Value": clean_value(row.get("colours_list", "")),
-            "Option2 Linked To": "",
-            "Option3 Name": "",
-            "Option3 Value": "",
-            "Option3 Linked To": "",
+            "Option2 Name": main_only(np.where(colours != "", "Color", "")),
+            "Option2 Value": colours,
             
             # Variant Fields
-            "Variant SKU": clean_value(get_column_value(row, column_mapping, 'Variant SKU', '') or 
-                                     get_column_value(row, column_mapping, 'product code', '')),
-            "Variant Grams": 0,
-            "Variant Inventory Tracker": "",
-            "Variant Inventory Qty": clean_value(row.get("Variant Inventory Qty", 0), is_numeric=True),
-            "Variant Inventory Policy": config.get('inventory_policy', 'deny'),
-            "Variant Fulfillment Service": "manual",
-            "Variant Price": variant_price,
-            "Variant Compare At Price": compare_price,  # FIXED: Blank if no value
-            "Variant Requires Shipping": "TRUE",
-            "Variant Taxable": "TRUE",
-            
-            # Unit Price Fields
-            "Unit Price Total Measure": "",
-            "Unit Price Total Measure Unit": "",
-            "Unit Price Base Measure": "",
-            "Unit Price Base Measure Unit": "",
-            
-            "Variant Barcode": "",
-            
-            # Image Fields
-            "Image Src": "",
-            "Image Position": "",
-            "Image Alt Text": "",
-            "Gift Card": "FALSE",
-            
-            # SEO Fields
-            "SEO Title": "",
-            "SEO Description": "",
-            
-            # Google Shopping Fields
-            "Google Shopping / Google Product Category": "",
-            "Google Shopping / Gender": "",
-            "Google Shopping / Age Group": "",
-            "Google Shopping / MPN": "",
-            "Google Shopping / Condition": "",
-            "Google Shopping / Custom Product": "",
-            "Google Shopping / Custom Label 0": "",
-            "Google Shopping / Custom Label 1": "",
-            "Google Shopping / Custom Label 2": "",
-            "Google Shopping / Custom Label 3": "",
-            "Google Shopping / Custom Label 4": "",
-            
-            # Metafields
-            "Gender (product.metafields.custom.gender)": "",
-            "Google: Custom Product (product.metafields.mm-google-shopping.custom_product)": "",
-            "Age group (product.metafields.shopify.age-group)": "",
-            "Color (product.metafields.shopify.color-pattern)": "",
-            "Dress occasion (product.metafields.shopify.dress-occasion)": "",
-            "Dress style (product.metafields.shopify.dress-style)": "",
-            "Fabric (product.metafields.shopify.fabric)": "",
-            "Neckline (product.metafields.shopify.neckline)": "",
-            "Size (product.metafields.shopify.size)": "",
-            "Skirt/Dress length type (product.metafields.shopify.skirt-dress-length-type)": "",
-            "Sleeve length type (product.metafields.shopify.sleeve-length-type)": "",
-            "Target gender (product.metafields.shopify.target-gender)": "",
-            "Complementary products (product.metafields.shopify--discovery--product_recommendation.complementary_products)": "",
-            "Related products (product.metafields.shopify--discovery--product_recommendation.related_products)": "",
-            "Related products settings (product.metafields.shopify--discovery--product_recommendation.related_products_display)": "",
-            "Search product boosts (product.metafields.shopify--discovery--product_search_boost.queries)": "",
+            "Variant SKU": variant_sku.to_numpy(dtype=object),
+            "Variant Grams": constant(0),
+            "Variant Inventory Qty": np.asarray(inventory_qty, dtype=object),
+            "Variant Inventory Policy": constant(config.get('inventory_policy', 'deny')),
+            "Variant Fulfillment Service": constant("manual"),
+            "Variant Price": variant_price.to_numpy(dtype=object),
+            "Variant Compare At Price": compare_price.mask(compare_blank, '').to_numpy(dtype=object),  # FIXED: Blank if no value
+            "Variant Requires Shipping": constant("TRUE"),
+            "Variant Taxable": constant("TRUE"),
+            "Gift Card": constant("FALSE"),
             
             # Final Fields
-            "Variant Image": "",
-            "Variant Weight Unit": "",
-            "Variant Tax Code": "",
-            "Cost per item": 0,
-            "Status": "draft"
+            "Cost per item": constant(0),
+            "Status": main_only(constant("draft")),
         }
-    
-    def _create_variant_row(self, row, column_mapping, handle, config):
-        """Create variant row with new fields"""
-        display_size = clean_value(row.get("display_size", ""))
-        variant_price = row.get('final_variant_price', get_column_value(row, column_mapping, 'Variant Price', 0))
-        variant_price = clean_value(variant_price, is_numeric=True)
         
-        # FIXED: Handle blank compare prices
-        compare_price = row.get("Variant Compare At Price", None)
-        if pd.isna(compare_price) or compare_price == '' or compare_price == 0:
-            compare_price = ''
-        else:
-            compare_price = clean_value(compare_price, is_numeric=True)
-        
-        return {
-            "Handle": clean_value(handle),
-            "Title": "",
-            "Body (HTML)": "",
-            "Vendor": "",
-            "Product Category": "",
-            "Type": "",
-            "Tags": "",
-            "Published": "",
-            "Option1 Name": "",
-            "Option1 Value": display_size,
-            "Option1 Linked To": "",
-            "Option2 Name": "",
-            "Option2 Value": clean_value(row.get("colours_list", "")),
-            "Option2 Linked To": "",
-            "Option3 Name": "",
-            "Option3 Value": "",
-            "Option3 Linked To": "",
-            "Variant SKU": clean_value(get_column_value(row, column_mapping, 'Variant SKU', '') or get_column_value(row, column_mapping, 'product code', '')),
-            "Variant Grams": 0,
-            "Variant Inventory Tracker": "",
-            "Variant Inventory Qty": clean_value(row.get("Variant Inventory Qty", 0), is_numeric=True),
-            "Variant Inventory Policy": config.get('inventory_policy', 'deny'),
-            "Variant Fulfillment Service": "manual",
-            "Variant Price": variant_price,
-            "Variant Compare At Price": compare_price,  # FIXED: Blank if no value
-            "Variant Requires Shipping": "TRUE",
-            "Variant Taxable": "TRUE",
-            "Unit Price Total Measure": "",
-            "Unit Price Total Measure Unit": "",
-            "Unit Price Base Measure": "",
-            "Unit Price Base Measure Unit": "",
-            "Variant Barcode": "",
-            "Image Src": "",
-            "Image Position": "",
-            "Image Alt Text": "",
-            "Gift Card": "FALSE",
-            "SEO Title": "",
-            "SEO Description": "",
-            "Google Shopping / Google Product Category": "",
-            "Google Shopping / Gender": "",
-            "Google Shopping / Age Group": "",
-            "Google Shopping / MPN": "",
-            "Google Shopping / Condition": "",
-            "Google Shopping / Custom Product": "",
-            "Google Shopping / Custom Label 0": "",
-            "Google Shopping / Custom Label 1": "",
-            "Google Shopping / Custom Label 2": "",
-            "Google Shopping / Custom Label 3": "",
-            "Google Shopping / Custom Label 4": "",
-            "Gender (product.metafields.custom.gender)": "",
-            "Google: Custom Product (product.metafields.mm-google-shopping.custom_product)": "",
-            "Age group (product.metafields.shopify.age-group)": "",
-            "Color (product.metafields.shopify.color-pattern)": "",
-            "Dress occasion (product.metafields.shopify.dress-occasion)": "",
-            "Dress style (product.metafields.shopify.dress-style)": "",
-            "Fabric (product.metafields.shopify.fabric)": "",
-            "Neckline (product.metafields.shopify.neckline)": "",
-            "Size (product.metafields.shopify.size)": "",
-            "Skirt/Dress length type (product.metafields.shopify.skirt-dress-length-type)": "",
-            "Sleeve length type (product.metafields.shopify.sleeve-length-type)": "",
-            "Target gender (product.metafields.shopify.target-gender)": "",
-            "Complementary products (product.metafields.shopify--discovery--product_recommendation.complementary_products)": "",
-            "Related products (product.metafields.shopify--discovery--product_recommendation.related_products)": "",
-            "Related products settings (product.metafields.shopify--discovery--product_recommendation.related_products_display)": "",
-            "Search product boosts (product.metafields.shopify--discovery--product_search_boost.queries)": "",
-            "Variant Image": "",
-            "Variant Weight Unit": "",
-            "Variant Tax Code": "",
-            "Cost per item": 0,
-            "Status": ""
-        }
\ No newline at end of file
+        # Every other Shopify column (unit price, images, SEO, Google Shopping, metafields) is blank
+        blank = constant("")
+        shopify_df = pd.DataFrame({column: columns.get(column, blank) for column in SHOPIFY_EXPORT_COLUMNS})
+        
+        # Infer column dtypes exactly as a frame built from per-row dicts would
+        return shopify_df.infer_objects()
@@ -0,0 +1,52 @@
+# backend/rate_limiter.py - Request and token rate limiting for AI calls
+import threading
+import time
+
+class TokenBucket:
+    """Bucket refilled continuously at rate_per_minute, holding at most one minute of quota"""
+    
+    def __init__(self, rate_per_minute, clock=time.monotonic):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = float(rate_per_minute)
+        self.level = self.capacity
+        self.clock = clock
+        self.updated = clock()
+    
+    def reserve(self, amount):
+        """Take amount from the bucket (going into debt if needed) - returns seconds to wait before using it"""
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate_per_second)
+        self.updated = now
+        
+        self.level -= min(amount, self.capacity)
+        if self.level >= 0:
+            return 0.0
+        return -self.level / self.rate_per_second
+
+class RateLimiter:
+    """Requests/min and tokens/min limits shared by all worker threads
+    
+    A limit of 0 or None disables that bucket.
+    """
+    
+    def __init__(self, requests_per_minute, tokens_per_minute, clock=time.monotonic, sleep=time.sleep):
+        self.request_bucket = TokenBucket(requests_per_minute, clock) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute, clock) if tokens_per_minute else None
+        self.sleep = sleep
+        self.waited_seconds = 0.0
+        self._lock = threading.Lock()
+    
+    def acquire(self, tokens=0):
+        """Block until one request of about `tokens` tokens fits in both limits"""
+        with self._lock:
+            wait = 0.0
+            if self.request_bucket:
+                wait = max(wait, self.request_bucket.reserve(1))
+            if self.token_bucket and tokens:
+                wait = max(wait, self.token_bucket.reserve(tokens))
+            self.waited_seconds += wait
+        
+        # Sleep outside the lock - the reservation already holds this caller's place
+        if wait > 0:
+            self.sleep(wait)
+        return wait
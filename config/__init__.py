@@ -6,6 +6,7 @@ Configuration package for the Shopify CSV Builder
 from .constants import (
     SHOPIFY_REQUIRED_COLUMNS,
     SHOPIFY_OPTIONAL_COLUMNS, 
+    SHOPIFY_EXPORT_COLUMNS,
     STANDARD_SIZE_ORDER,
     AI_PROCESSING_MODES,
     COLUMN_MAPPING_VARIANTS
@@ -16,6 +17,7 @@ from .settings import AppSettings
 __all__ = [
     'SHOPIFY_REQUIRED_COLUMNS',
     'SHOPIFY_OPTIONAL_COLUMNS',
+    'SHOPIFY_EXPORT_COLUMNS',
     'STANDARD_SIZE_ORDER', 
     'AI_PROCESSING_MODES',
     'COLUMN_MAPPING_VARIANTS',
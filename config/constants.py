@@ -27,6 +27,44 @@ SHOPIFY_OPTIONAL_COLUMNS = [
     "Variant Tax Code", "Cost per item", "Status"
 ]
 
+# Exact column order of the generated Shopify import file (including metafields)
+SHOPIFY_EXPORT_COLUMNS = [
+    "Handle", "Title", "Body (HTML)", "Vendor", "Product Category", "Type", "Tags", "Published",
+    "Option1 Name", "Option1 Value", "Option1 Linked To",
+    "Option2 Name", "Option2 Value", "Option2 Linked To",
+    "Option3 Name", "Option3 Value", "Option3 Linked To",
+    "Variant SKU", "Variant Grams", "Variant Inventory Tracker", "Variant Inventory Qty",
+    "Variant Inventory Policy", "Variant Fulfillment Service", "Variant Price", "Variant Compare At Price",
+    "Variant Requires Shipping", "Variant Taxable",
+    "Unit Price Total Measure", "Unit Price Total Measure Unit",
+    "Unit Price Base Measure", "Unit Price Base Measure Unit",
+    "Variant Barcode",
+    "Image Src", "Image Position", "Image Alt Text", "Gift Card",
+    "SEO Title", "SEO Description",
+    "Google Shopping / Google Product Category", "Google Shopping / Gender", "Google Shopping / Age Group",
+    "Google Shopping / MPN", "Google Shopping / Condition", "Google Shopping / Custom Product",
+    "Google Shopping / Custom Label 0", "Google Shopping / Custom Label 1", "Google Shopping / Custom Label 2",
+    "Google Shopping / Custom Label 3", "Google Shopping / Custom Label 4",
+    # Metafields
+    "Gender (product.metafields.custom.gender)",
+    "Google: Custom Product (product.metafields.mm-google-shopping.custom_product)",
+    "Age group (product.metafields.shopify.age-group)",
+    "Color (product.metafields.shopify.color-pattern)",
+    "Dress occasion (product.metafields.shopify.dress-occasion)",
+    "Dress style (product.metafields.shopify.dress-style)",
+    "Fabric (product.metafields.shopify.fabric)",
+    "Neckline (product.metafields.shopify.neckline)",
+    "Size (product.metafields.shopify.size)",
+    "Skirt/Dress length type (product.metafields.shopify.skirt-dress-length-type)",
+    "Sleeve length type (product.metafields.shopify.sleeve-length-type)",
+    "Target gender (product.metafields.shopify.target-gender)",
+    "Complementary products (product.metafields.shopify--discovery--product_recommendation.complementary_products)",
+    "Related products (product.metafields.shopify--discovery--product_recommendation.related_products)",
+    "Related products settings (product.metafields.shopify--discovery--product_recommendation.related_products_display)",
+    "Search product boosts (product.metafields.shopify--discovery--product_search_boost.queries)",
+    "Variant Image", "Variant Weight Unit", "Variant Tax Code", "Cost per item", "Status"
+]
+
 # Size ordering for proper sorting - this is business logic that rarely changes
 STANDARD_SIZE_ORDER = [
     'XXS', 'XS', 'S', 'M', 'L', 'XL', 'XXL', 'XXXL', 
@@ -116,7 +154,24 @@ MAX_FILE_SIZE_MB = 50
 SUPPORTED_FILE_TYPES = ['csv', 'xlsx']
 MAX_ROWS_PER_BATCH = 1000
 
+# CSV export
+CSV_EXPORT_CHUNK_ROWS = 5000  # rows serialized per block
+CSV_EXPORT_SPOOL_MB = 32  # larger exports spill to a temp file on disk
+
 # AI service configuration
 GEMINI_MODEL_NAME = 'models/gemini-2.5-flash'
 AI_REQUEST_TIMEOUT = 30  # seconds
-AI_RETRY_ATTEMPTS = 3
\ No newline at end of file
+AI_RETRY_ATTEMPTS = 3
+
+# AI response cache
+AI_CACHE_PATH = '.cache/ai_responses.sqlite3'
+AI_CACHE_TTL_DAYS = 30
+AI_CACHE_MAX_MB = 100
+
+# AI job checkpoints
+AI_JOURNAL_PATH = '.cache/ai_jobs.sqlite3'
+AI_JOURNAL_MAX_AGE_DAYS = 7
+
+# Saved column mappings, keyed by header layout
+MAPPING_STORE_PATH = '.cache/mapping_profiles.sqlite3'
+MAPPING_STORE_MAX_PROFILES = 200
@@ -19,7 +19,20 @@ class AppSettings:
     MAX_PRODUCTS_EXPANDED = 3  # Auto-expand first N products in inventory mgmt
     
     # Processing settings
-    AI_PROCESSING_DELAY = 0.1  # seconds between AI requests
+    AI_REQUESTS_PER_MINUTE = 60  # Gemini quota: requests per minute
+    AI_TOKENS_PER_MINUTE = 250000  # Gemini quota: tokens per minute
+    AI_RETRY_BASE_DELAY = 1.0  # seconds, doubled on every retry
+    AI_RETRY_MAX_DELAY = 30.0  # seconds
+    AI_MAX_WORKERS = 8  # concurrent AI requests
+    AI_BATCH_TOKEN_BUDGET = 4000  # approx. input tokens per batched full-mode request
+    AI_BATCH_MAX_ITEMS = 25  # products per batched request
+    AI_NEAR_DUPLICATE_THRESHOLD = None  # e.g. 0.9 to also merge near-identical descriptions (MinHash)
+    AI_MAX_CONCURRENT_JOBS = 1  # background jobs running at once - they share the API key's limits
+    AI_JOB_POLL_SECONDS = 1.0  # how often the progress page refreshes
+    AI_JOB_RETENTION_MINUTES = 60  # finished jobs not picked up by their session are dropped after this
+    AI_INPUT_COST_PER_MILLION_TOKENS = 0.30  # USD, for the usage report - set to your model's pricing
+    AI_OUTPUT_COST_PER_MILLION_TOKENS = 2.50  # USD, includes thinking tokens
+    COLUMN_PROFILE_SAMPLE_ROWS = 200  # non-empty values sampled per column to detect its contents
     ENABLE_PROGRESS_BARS = True
     AUTO_SAVE_SESSION = True
     
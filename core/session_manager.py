@@ -124,6 +124,10 @@ class SessionManager:
             'extracted_compare_prices': st.session_state.get('extracted_compare_prices', {})
         }
     
+    def get_variant_index_stats(self):
+        """Get variant index cache hits vs rebuilds"""
+        return st.session_state.get('variant_index_stats', {'hits': 0, 'rebuilds': 0})
+    
     def is_mapping_complete(self):
         """Check if column mapping is complete"""
         return st.session_state.get('column_mapping_complete', False)
@@ -156,7 +160,8 @@ class SessionManager:
         clear_keys = [
             'processed_data', 'df_raw', 'column_mapping_complete',
             'unique_variants', 'variant_quantities', 'variant_compare_prices',
-            'variant_products', 'description_elements'
+            'variant_products', 'description_elements', 'variant_index_cache', 'ai_stopped',
+            'ai_job_id', 'ai_enhanced_mode', 'ai_run_summary', 'ai_job_error', 'description_cache'
         ]
         for key in clear_keys:
             if key in st.session_state:
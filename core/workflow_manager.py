@@ -1,7 +1,8 @@
 # core/workflow_manager.py - FIXED: Paragraph tag wraps entire content
 import streamlit as st
-from helpers.column_mapper import ColumnMapper
+from helpers.column_mapper import ColumnMapper, MappingResult
 from helpers.description_generator import DescriptionGenerator
+from helpers.mapping_store import MappingStore, get_mapping_store
 
 class WorkflowManager:
     """Enhanced workflow manager with step-based processing and dynamic description builder"""
@@ -9,6 +10,7 @@ class WorkflowManager:
     def __init__(self):
         self.column_mapper = ColumnMapper()
         self.description_generator = DescriptionGenerator()
+        self.mapping_store = get_mapping_store()
     
     def execute_file_upload(self, ui, file_handler):
         """Step 1: Enhanced file upload with metrics and preview"""
@@ -26,13 +28,53 @@ class WorkflowManager:
             
             # Store raw data and show enhanced metrics
             st.session_state.df_raw = df_raw
+            self._restore_saved_mapping(df_raw)
             ui.show_file_metrics(df_raw)
-            return True
             
+            if st.session_state.get('saved_mapping_restored'):
+                st.success("🔁 Known column layout - the mapping you confirmed for these headers before is restored")
+            
+            load_stats = getattr(file_handler, 'last_load_stats', None)
+            if load_stats:
+                st.caption(f"Loaded {load_stats['rows']:,} rows in {load_stats['seconds']:.2f}s "
+                           f"({load_stats['rows_per_sec']:,.0f} rows/sec)")
+            return True
+        
         except Exception as e:
             st.error(f"Error loading file: {str(e)}")
             return False
     
+    def _restore_saved_mapping(self, df_raw):
+        """On a new header layout, reset mapping state and pre-fill it from a saved profile if there is one"""
+        signature = MappingStore.header_signature(df_raw.columns)
+        if st.session_state.get('header_signature') == signature:
+            return
+        
+        st.session_state.header_signature = signature
+        for key in ('mapping_result', 'current_column_mapping', 'saved_mapping_restored'):
+            st.session_state.pop(key, None)
+        
+        # A saved profile replaces column analysis entirely
+        saved_mapping = self.mapping_store.lookup(df_raw.columns)
+        if saved_mapping:
+            unmapped_columns = [col for col in df_raw.columns if col not in saved_mapping.values()]
+            confidence_scores = {col: 1.0 for col in saved_mapping.values()}
+            st.session_state.mapping_result = MappingResult(saved_mapping, unmapped_columns, confidence_scores)
+            st.session_state.saved_mapping_restored = True
+    
+    def apply_saved_mapping(self, session):
+        """Confirm a restored mapping without reviewing it in step 2"""
+        mapping = st.session_state.mapping_result.base_mapping.copy()
+        st.session_state.current_column_mapping = mapping.copy()
+        session.store_mappings(mapping)
+        session.set_mapping_complete(True)
+    
+    def save_confirmed_mapping(self, session):
+        """Remember the confirmed mapping for the next file with this header layout"""
+        df_raw = session.get('df_raw')
+        if df_raw is not None and session.get_mappings():
+            self.mapping_store.save(df_raw.columns, session.get_mappings())
+    
     def execute_column_mapping_enhanced(self, ui, session):
         """Step 2: Enhanced column mapping with complete Shopify fields and editable interface"""
         df_raw = st.session_state.df_raw
@@ -63,10 +105,12 @@ class WorkflowManager:
                     for shopify_field, user_column in cleaned_mapping.items():
                         st.write(f"• **{shopify_field}** → {user_column}")
             
+            ui.render_mapping_profiles(self.mapping_store)
+            
             # Auto-confirm mapping (user can always go back to modify)
             session.set_mapping_complete(True)
             return True
-            
+        
         except Exception as e:
             st.error(f"Error in column mapping: {str(e)}")
             return False
@@ -88,7 +132,7 @@ class WorkflowManager:
             session.set_description_elements(description_elements)
             
             return True
-            
+        
         except Exception as e:
             st.error(f"Error in description builder: {str(e)}")
             return False
@@ -101,24 +145,19 @@ class WorkflowManager:
             description_elements = session.get_description_elements()
             config = session.get_config()
             
-            # Generate enhanced descriptions for all rows
-            if description_elements:
-                sorted_elements = sorted([elem for elem in description_elements if elem.get('column')], 
-                                       key=lambda x: x.get('order', 0))
-                
-                df_raw['enhanced_description'] = df_raw.apply(
-                    lambda row: self._generate_description_html(sorted_elements, row),
-                    axis=1
-                )
-            
             # Process variants and inventory
             processed_df = data_processor.process_data(df_raw, column_mapping, config)
             
+            # Descriptions are rendered per source product and joined onto its variants
+            processed_df = self.description_generator.apply_enhanced_descriptions(
+                processed_df, df_raw, description_elements
+            )
+            
             # Store processed data
             session.set('processed_data', processed_df)
             
             return True
-            
+        
         except Exception as e:
             st.error(f"Error processing data: {str(e)}")
             return False
@@ -145,7 +184,7 @@ class WorkflowManager:
             session.set('processed_data', enhanced_df)
             
             return True
-            
+        
         except Exception as e:
             st.error(f"AI processing failed: {str(e)}")
             st.warning("Continuing with original descriptions...")
@@ -170,10 +209,13 @@ class WorkflowManager:
             st.markdown("### 📋 Variant Quantity & Price Editor")
             st.info("💡 Use the sidebar (⚙️ Configuration) to manage bulk settings, surcharges, and defaults. Edit individual variants below.")
             
+            index_stats = session.get_variant_index_stats()
+            st.caption(f"Variant index: {index_stats['hits']} cache hits • {index_stats['rebuilds']} rebuilds")
+            
             ui.render_variant_editor(session.get_variants())
             
             return True
-            
+        
         except Exception as e:
             st.error(f"Error in inventory management: {str(e)}")
             return False
@@ -190,23 +232,12 @@ class WorkflowManager:
             
             processed_df = session.get('processed_data')
             column_mapping = session.get_mappings()
-            column_descriptions = session.get_descriptions()
             description_elements = session.get_description_elements()
             config = session.get_config()
             
-            # Apply enhanced descriptions if not already applied
-            if 'enhanced_description' not in processed_df.columns and description_elements:
-                sorted_elements = sorted([elem for elem in description_elements if elem.get('column')], 
-                                       key=lambda x: x.get('order', 0))
-                
-                processed_df['enhanced_description'] = processed_df.apply(
-                    lambda row: self._generate_description_html(sorted_elements, row),
-                    axis=1
-                )
-            
-            # For backward compatibility, also apply traditional descriptions
+            # Re-join the cached descriptions - they are only re-rendered if the elements changed since processing
             enhanced_df = self.description_generator.apply_enhanced_descriptions(
-                processed_df, column_mapping, column_descriptions
+                processed_df, st.session_state.df_raw, description_elements
             )
             
             # Generate final CSV
@@ -224,62 +255,11 @@ class WorkflowManager:
             ui.render_download_section(shopify_csv)
             
             return True
-            
+        
         except Exception as e:
             st.error(f"Error generating final CSV: {str(e)}")
             return False
     
-    def _generate_description_html(self, elements, row):
-        """FIXED: Wrap entire content in paragraph tag, apply user tags to labels only"""
-        html_parts = []
-        
-        for element in elements:
-            column = element.get('column', '')
-            label = element.get('label', '')
-            html_tag = element.get('html_tag', 'p')
-            
-            if column and column in row.index:
-                value = self._clean_value(row[column])
-                if value:
-                    if label and label.strip():
-                        # FIXED: Apply user tag to label, add value after
-                        if html_tag == 'none':
-                            # No tag - just label and value
-                            html_parts.append(f"{label}: {value}")
-                        elif html_tag == 'br':
-                            # Line break after
-                            html_parts.append(f"{label}: {value}<br>")
-                        elif html_tag == 'li':
-                            # List item wraps everything
-                            html_parts.append(f"<li>{label}: {value}</li>")
-                        elif html_tag == 'p':
-                            # FIXED: Paragraph wraps the entire label+value together
-                            html_parts.append(f"<p>{label}: {value}</p>")
-                        else:
-                            # Other tags wrap label only, value follows
-                            html_parts.append(f"<p><{html_tag}>{label} : </{html_tag}> {value}</p>")
-                    else:
-                        # No label - just value with tag
-                        if html_tag == 'none':
-                            html_parts.append(value)
-                        elif html_tag == 'br':
-                            html_parts.append(f"{value}<br>")
-                        elif html_tag == 'li':
-                            html_parts.append(f"<li>{value}</li>")
-                        elif html_tag == 'p':
-                            html_parts.append(f"<p>{value}</p>")
-                        else:
-                            html_parts.append(f"<p><{html_tag}>{value}</{html_tag}></p>")
-        
-        return " ".join(html_parts)
-    
-    def _clean_value(self, value):
-        """Clean value for HTML generation"""
-        import pandas as pd
-        if pd.isna(value) or str(value).strip() == '':
-            return ""
-        return str(value).strip()
-    
     # Legacy methods for backward compatibility
     def execute_column_mapping(self, ui, session):
         """Legacy column mapping method"""
@@ -301,7 +281,7 @@ class WorkflowManager:
             
             st.success(f"Processed {len(processed_df)} product variants")
             return True
-            
+        
         except Exception as e:
             st.error(f"Error processing data: {str(e)}")
             return False
\ No newline at end of file
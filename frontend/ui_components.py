@@ -1,8 +1,11 @@
 # frontend/ui_components.py - COMPLETE FILE with all methods
+import json
 import streamlit as st
 import pandas as pd
 import time
 from helpers.utils import get_column_value, clean_value
+from helpers.file_handler import FileHandler
+from helpers.description_generator import DescriptionTemplate
 
 class UIComponents:    
     def apply_styling(self):
@@ -234,7 +237,8 @@ class UIComponents:
                     with col1:
                         existing_sizes = list(config['surcharge_rules'].keys())
                         default_size = existing_sizes[i] if i < len(existing_sizes) else ""
-                        size = st.text_input(f"Size {i+1}", value=default_size, key=f"size_{i}").upper().strip()
+                        size = st.text_input(f"Size {i+1}", value=default_size, key=f"size_{i}",
+                                             help="A size (XL) or a size tier (>=XL, <=XS). Exact sizes win over tiers.").upper().strip()
                     with col2:
                         default_percent = config['surcharge_rules'].get(existing_sizes[i], 0) * 100 if i < len(existing_sizes) else 0
                         percent = st.number_input(f"%", min_value=0.0, value=float(default_percent), step=0.5, key=f"percent_{i}")
@@ -447,6 +451,29 @@ class UIComponents:
         
         return st.session_state.current_column_mapping.copy()
     
+    def render_mapping_profiles(self, mapping_store):
+        """Export and import of saved column mapping profiles"""
+        with st.expander("💾 Saved Mapping Profiles", expanded=False):
+            st.caption(f"{mapping_store.stats()['profiles']} saved header layouts • the mapping is saved "
+                       "when you continue to the description builder")
+            
+            st.download_button(
+                label="⬇️ Export profiles (JSON)",
+                data=mapping_store.export_profiles(),
+                file_name="mapping_profiles.json",
+                mime="application/json"
+            )
+            
+            uploaded = st.file_uploader("Import profiles", type=["json"], key="mapping_profiles_upload")
+            # The uploader keeps its file across reruns - import each file once
+            if uploaded is not None and st.session_state.get('mapping_profiles_imported') != (uploaded.name, uploaded.size):
+                try:
+                    count = mapping_store.import_profiles(uploaded.getvalue().decode("utf-8"))
+                    st.session_state.mapping_profiles_imported = (uploaded.name, uploaded.size)
+                    st.success(f"Imported {count} mapping profiles")
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    st.error(f"Not a mapping profile export: {e}")
+    
     def _render_mapping_section(self, df, fields, confidence_scores, show_auto_populate=False):
         """Render a section of mapping fields with optional auto-populate indicators"""
         auto_populate_fields = {
@@ -619,14 +646,10 @@ class UIComponents:
         if description_elements:
             st.subheader("Live Preview")
             
-            # Sort elements by order
-            sorted_elements = sorted([elem for elem in description_elements if elem['column']], 
-                                   key=lambda x: x.get('order', 0))
-            
-            # Generate preview
-            if len(df) > 0 and sorted_elements:
-                sample_row = df.iloc[0]
-                preview_html = self._generate_description_preview(sorted_elements, sample_row)
+            # Generate preview with the same template as the export
+            template = DescriptionTemplate(description_elements)
+            if len(df) > 0 and template.parts:
+                preview_html = template.render(df.head(1)).iloc[0]
                 
                 st.markdown("**HTML Output:**")
                 st.markdown(f'<div class="preview-box">{preview_html}</div>', unsafe_allow_html=True)
@@ -636,45 +659,6 @@ class UIComponents:
         
         return description_elements
     
-    def _generate_description_preview(self, elements, row):
-        """FIXED: Generate preview with correct paragraph formatting"""
-        html_parts = []
-        
-        for element in elements:
-            column = element.get('column', '')
-            label = element.get('label', '')
-            html_tag = element.get('html_tag', 'p')
-            
-            if column and column in row.index:
-                value = self._clean_value_no_decimals(row[column], column)
-                if value:
-                    if label and label.strip():
-                        if html_tag == 'none':
-                            html_parts.append(f"{label}: {value}")
-                        elif html_tag == 'br':
-                            html_parts.append(f"{label}: {value}<br>")
-                        elif html_tag == 'li':
-                            html_parts.append(f"<li>{label}: {value}</li>")
-                        elif html_tag == 'p':
-                            # FIXED: Paragraph wraps entire content
-                            html_parts.append(f"<p>{label}: {value}</p>")
-                        else:
-                            # Other tags wrap label only
-                            html_parts.append(f"<p> <{html_tag}>{label} : </{html_tag}> {value}</p>")
-                    else:
-                        if html_tag == 'none':
-                            html_parts.append(value)
-                        elif html_tag == 'br':
-                            html_parts.append(f"{value}<br>")
-                        elif html_tag == 'li':
-                            html_parts.append(f"<li>{value}</li>")
-                        elif html_tag == 'p':
-                            html_parts.append(f"<p>{value}</p>")
-                        else:
-                            html_parts.append(f"<p><{html_tag}>{value}</{html_tag}></p>")
-        
-        return " ".join(html_parts)
-    
     def _clean_value_no_decimals(self, value, column_name: str = '') -> str:
         """Remove decimals from integer fields"""
         import pandas as pd
@@ -837,9 +821,53 @@ class UIComponents:
             except:
                 st.dataframe(df[["Title", "Variant Price"]], use_container_width=True)
     
+    def render_ai_job_progress(self, job):
+        """Live progress of a background AI job"""
+        if job.status == job.QUEUED:
+            st.info("⏳ AI enhancement is queued behind another job...")
+            return
+        
+        st.progress(job.progress)
+        elapsed = time.time() - job.created
+        if job.total:
+            st.text(f"AI is enhancing your descriptions: {job.done}/{job.total} products ({elapsed:.0f}s)")
+        else:
+            st.text(f"AI is preparing your descriptions... ({elapsed:.0f}s)")
+        st.caption("You can keep using the page - the job continues in the background.")
+    
+    def render_ai_usage(self, usage):
+        """Sidebar summary of an AI job's token usage and cost, with the JSON report"""
+        if not usage:
+            return
+        
+        with st.sidebar:
+            st.subheader("🤖 AI Usage")
+            col1, col2 = st.columns(2)
+            col1.metric("Requests", usage['calls'])
+            col2.metric("Est. cost", f"${usage['cost_usd']:.4f}")
+            col1.metric("Prompt tokens", f"{usage['prompt_tokens']:,}")
+            col2.metric("Response tokens", f"{usage['response_tokens']:,}")
+            
+            for kind, stats in usage['by_kind'].items():
+                st.caption(f"{kind}: {stats['calls']} calls • avg {stats['avg_latency']:.2f}s • "
+                           f"p95 {stats['p95_latency']:.2f}s")
+            if usage['errors']:
+                st.caption(f"{usage['errors']} failed attempts ({usage.get('retries', 0)} retried, the rest reported)")
+            if usage['estimated_tokens']:
+                st.caption("Token counts are estimated - the model did not report usage.")
+            
+            st.download_button(
+                label="📊 Download usage report (JSON)",
+                data=json.dumps(usage, indent=2),
+                file_name="ai_usage_report.json",
+                mime="application/json"
+            )
+    
     def render_download_section(self, df):
         """Enhanced download section with step completion"""
-        csv_data = df.to_csv(index=False).encode("utf-8")
+        # Serialize in row blocks - only the finished bytes handed to the button stay in memory
+        with FileHandler.write_csv(df) as csv_file:
+            csv_data = csv_file.read()
         
         col1, col2 = st.columns(2)
         
@@ -1,9 +1,12 @@
 # helpers/column_mapper.py - Enhanced column mapping with intelligent detection
+import numpy as np
 import pandas as pd
 import re
+from collections import Counter
 from dataclasses import dataclass
 from typing import Dict, List, Tuple
 from difflib import SequenceMatcher
+from config.settings import AppSettings
 
 @dataclass
 class MappingResult:
@@ -15,9 +18,56 @@ class MappingResult:
 class ColumnMapper:
     """Enhanced column mapping with multiple detection methods"""
     
-    def __init__(self):
+    # Fuzzy matches must score above this
+    FUZZY_THRESHOLD = 0.7
+    
+    # Score given when one cleaned name contains the other
+    CONTAINMENT_SCORE = 0.8
+    
+    # Content detectors, applied to lowercased and stripped values
+    _PRICE_NOISE = re.compile(r'[₹$€£,\s]')
+    _STATUS_WORDS = {'active', 'inactive', 'draft', 'published', 'unpublished', 'true', 'false', 'yes', 'no'}
+    _SIZE_PATTERN = re.compile(r'\b(?:xs|s|m|l|xl|xxl|xxxl)\b|\b\d{1,2}\b|\b(?:small|medium|large)\b|\b\d{1,2}-\d+\b')
+    _COLOUR_PATTERN = re.compile('|'.join([
+        'red', 'blue', 'green', 'yellow', 'black', 'white', 'pink', 'purple',
+        'orange', 'brown', 'gray', 'grey', 'navy', 'maroon', 'teal', 'cyan'
+    ]))
+    _CATEGORY_PATTERN = re.compile('|'.join([
+        'shirt', 'dress', 'pants', 'jeans', 'jacket', 'shoes', 'bag',
+        'jewelry', 'clothing', 'apparel', 'accessories', 'footwear'
+    ]))
+    _CODE_PATTERN = re.compile(r'^[A-Za-z0-9_-]+$')
+    _CODE_NAME_HINTS = ['sku', 'code', 'id', 'number', 'ref']
+    
+    def __init__(self, sample_rows=None):
+        self.sample_rows = sample_rows or AppSettings.COLUMN_PROFILE_SAMPLE_ROWS
         self.standard_variants = self._get_column_variants()
         self.standard_fields = list(self.standard_variants.keys())
+        self._build_variant_index()
+    
+    def _build_variant_index(self):
+        """Cleaned variant names with bigram and length indexes, so fuzzy matching only scores likely candidates"""
+        # Cleaned name -> [(position in variant order, standard name)]; a name can belong to several fields
+        owners = {}
+        position = 0
+        for standard_name, variants in self.standard_variants.items():
+            for variant in variants:
+                owners.setdefault(self._clean_name(variant.lower()), []).append((position, standard_name))
+                position += 1
+        
+        self._variant_names = list(owners)
+        self._variant_owners = [owners[name] for name in self._variant_names]
+        self._variant_matchers = []
+        self._bigram_index = {}
+        self._length_index = {}
+        for i, name in enumerate(self._variant_names):
+            # SequenceMatcher caches its analysis of the second sequence - set it once per variant
+            matcher = SequenceMatcher(None)
+            matcher.set_seq2(name)
+            self._variant_matchers.append(matcher)
+            for gram in self._bigrams(name):
+                self._bigram_index.setdefault(gram, []).append(i)
+            self._length_index.setdefault(len(name), []).append(i)
     
     def analyze_columns(self, df: pd.DataFrame) -> MappingResult:
         """Perform complete column analysis and mapping"""
@@ -80,36 +130,77 @@ class ColumnMapper:
         return fuzzy_mapping, confidence_scores
     
     def _find_best_fuzzy_match(self, column: str, existing_mapping: Dict[str, str]) -> Tuple[str, float]:
-        """Find best fuzzy match for a column"""
+        """Find best fuzzy match for a column
+        
+        Same result as scoring every variant in order (the first of equally good
+        variants wins), but variants are taken from the indexes and skipped when
+        SequenceMatcher's cheap upper bounds show they cannot win.
+        """
+        column_clean = self._clean_name(column.lower())
         best_score = 0
+        best_position = None
         best_standard = None
         
-        for standard_name, variants in self.standard_variants.items():
-            if standard_name in existing_mapping:
+        for i in self._fuzzy_candidates(column_clean):
+            owners = [owner for owner in self._variant_owners[i] if owner[1] not in existing_mapping]
+            if not owners:
                 continue
             
-            for variant in variants:
-                similarity = self._calculate_similarity(column.lower(), variant.lower())
-                if similarity > best_score and similarity > 0.7:
-                    best_score = similarity
-                    best_standard = standard_name
+            name = self._variant_names[i]
+            floor = self.CONTAINMENT_SCORE if name in column_clean or column_clean in name else 0
+            matcher = self._variant_matchers[i]
+            matcher.set_seq1(column_clean)
+            if not self._can_win(max(floor, matcher.real_quick_ratio()), best_score):
+                continue
+            if not self._can_win(max(floor, matcher.quick_ratio()), best_score):
+                continue
+            
+            similarity = max(floor, matcher.ratio())
+            position, standard_name = owners[0]
+            if not self._can_win(similarity, best_score):
+                continue
+            if similarity > best_score or position < best_position:
+                best_score, best_position, best_standard = similarity, position, standard_name
         
         return (best_standard, best_score) if best_standard else None
     
-    def _calculate_similarity(self, str1: str, str2: str) -> float:
-        """Calculate similarity between two strings"""
-        # Clean strings for better matching
-        str1_clean = re.sub(r'[_\-\s]+', '', str1)
-        str2_clean = re.sub(r'[_\-\s]+', '', str2)
+    def _can_win(self, score: float, best_score: float) -> bool:
+        """Whether a (bound on a) score passes the threshold and reaches the best so far"""
+        return score > self.FUZZY_THRESHOLD and score >= best_score
+    
+    def _fuzzy_candidates(self, column_clean: str) -> List[int]:
+        """Variant indexes that could score above the threshold, most shared bigrams first
         
-        # Base similarity
-        similarity = SequenceMatcher(None, str1_clean, str2_clean).ratio()
+        A variant scores above the threshold only by containment (then it shares
+        a bigram with the column) or by SequenceMatcher ratio, which needs a
+        length within the window below.
+        """
+        if len(column_clean) < 2:
+            return range(len(self._variant_names))
         
-        # Boost if one contains the other
-        if str2_clean in str1_clean or str1_clean in str2_clean:
-            similarity = max(similarity, 0.8)
+        overlap = Counter()
+        for gram in self._bigrams(column_clean):
+            overlap.update(self._bigram_index.get(gram, ()))
         
-        return similarity
+        # ratio <= 2 * min(len) / (len1 + len2), which must exceed the threshold
+        length = len(column_clean)
+        low = length * self.FUZZY_THRESHOLD / (2 - self.FUZZY_THRESHOLD)
+        high = length * (2 - self.FUZZY_THRESHOLD) / self.FUZZY_THRESHOLD
+        candidates = [i for i, _ in overlap.most_common()]
+        for name_length, indexes in self._length_index.items():
+            if low <= name_length <= high:
+                candidates.extend(i for i in indexes if i not in overlap)
+        return candidates
+    
+    def _clean_name(self, name: str) -> str:
+        """Column name without separators, as compared by fuzzy matching"""
+        return re.sub(r'[_\-\s]+', '', name)
+    
+    def _bigrams(self, name: str) -> set:
+        """Character bigrams of a cleaned name (the name itself when shorter)"""
+        if len(name) < 2:
+            return {name}
+        return {name[i:i + 2] for i in range(len(name) - 1)}
     
     def _content_analysis(self, df: pd.DataFrame, unmapped_columns: List[str], 
                          existing_mapping: Dict[str, str]) -> Tuple[Dict[str, str], Dict[str, float]]:
@@ -117,12 +208,9 @@ class ColumnMapper:
         content_mapping = {}
         confidence_scores = {}
         
-        for col in unmapped_columns:
-            sample_values = df[col].dropna().astype(str).head(10).tolist()
-            if not sample_values:
-                continue
-            
-            detected_type, confidence = self._detect_column_type(sample_values, col)
+        profile = self._profile_columns(df, unmapped_columns)
+        for col, scores in profile.iterrows():
+            detected_type, confidence = self._detect_column_type(scores)
             
             if detected_type and confidence > 0.6 and detected_type not in existing_mapping:
                 content_mapping[detected_type] = col
@@ -130,101 +218,87 @@ class ColumnMapper:
         
         return content_mapping, confidence_scores
     
-    def _detect_column_type(self, sample_values: List[str], column_name: str) -> Tuple[str, float]:
-        """Detect column type based on content analysis"""
-        values_lower = [str(v).lower().strip() for v in sample_values if str(v).strip()]
+    def _profile_columns(self, df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+        """Share of sampled values each detector accepts - one row per column that has any values
+        
+        All columns are checked together: the sample is melted into one long
+        series of (column, value) and every detector is a single vectorized op.
+        """
+        detectors = ['price', 'status', 'size', 'colour', 'category', 'code']
+        columns = [col for col in dict.fromkeys(columns) if col in df.columns]
+        if not columns:
+            return pd.DataFrame(columns=detectors, dtype=float)
+        
+        values = self._sample_values(df, columns)
+        # Object dtype keeps Python regex semantics whatever the string dtype of the file
+        text = values['value'].astype(str).astype(object).str.lower().str.strip()
+        keep = (text != '').to_numpy()
+        codes, uniques = pd.factorize(text[keep])
+        owner = values['column'].to_numpy()[keep]
+        
+        # Detectors run once per distinct value, then expand to the sampled values
+        distinct = pd.Series(uniques, dtype=object)
+        numbers = pd.to_numeric(distinct.str.replace(self._PRICE_NOISE, '', regex=True), errors='coerce')
+        checks = pd.DataFrame({
+            'price': (numbers > 0) & (numbers < 100000),
+            'status': distinct.isin(self._STATUS_WORDS),
+            'size': distinct.str.contains(self._SIZE_PATTERN),
+            'colour': distinct.str.contains(self._COLOUR_PATTERN),
+            'category': distinct.str.contains(self._CATEGORY_PATTERN),
+            'code': distinct.str.match(self._CODE_PATTERN) & (distinct.str.len() > 2),
+        }).iloc[codes]
+        profile = checks.astype(float).groupby(owner, sort=False).mean()
+        profile = profile.reindex([col for col in columns if col in profile.index])
         
+        # Names like "SKU" or "Item code" make a code column more likely
+        name_bonus = [0.3 if any(hint in str(col).lower() for hint in self._CODE_NAME_HINTS) else 0
+                      for col in profile.index]
+        profile['code'] = (profile['code'] + name_bonus).clip(upper=1.0)
+        return profile
+    
+    def _sample_values(self, df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+        """Long (column, value) frame of up to sample_rows non-null values per column
+        
+        Each column is sampled from its own filled cells, spread evenly over the
+        file, so a sparsely filled column is still profiled.
+        """
+        owners, samples = [], []
+        for col in columns:
+            filled = np.flatnonzero(df[col].notna().to_numpy())
+            if len(filled) > self.sample_rows:
+                filled = filled[np.unique(np.linspace(0, len(filled) - 1, self.sample_rows).round().astype(int))]
+            owners.append(np.full(len(filled), col, dtype=object))
+            samples.append(df[col].iloc[filled].to_numpy(dtype=object))
+        return pd.DataFrame({'column': np.concatenate(owners), 'value': np.concatenate(samples)})
+    
+    def _detect_column_type(self, scores: pd.Series) -> Tuple[str, float]:
+        """Detect column type from its profile scores"""
         # Price detection
-        if self._is_price_column(values_lower) > 0.7:
+        if scores['price'] > 0.7:
             return 'variant price', 0.8
         
         # Status detection
-        if self._is_status_column(values_lower) > 0.6:
+        if scores['status'] > 0.6:
             return 'published', 0.7
         
         # Size detection
-        if self._is_size_column(values_lower) > 0.6:
+        if scores['size'] > 0.6:
             return 'size', 0.7
         
         # Color detection
-        if self._is_color_column(values_lower) > 0.6:
+        if scores['colour'] > 0.6:
             return 'colour', 0.7
         
         # Category detection
-        if self._is_category_column(values_lower) > 0.5:
+        if scores['category'] > 0.5:
             return 'product category', 0.6
         
         # SKU/Code detection
-        if self._is_code_column(values_lower, column_name.lower()) > 0.7:
+        if scores['code'] > 0.7:
             return 'product code', 0.8
         
         return None, 0
     
-    def _is_price_column(self, values: List[str]) -> float:
-        """Check if values look like prices"""
-        price_count = 0
-        for value in values:
-            clean_value = re.sub(r'[₹$€£,\s]', '', str(value))
-            try:
-                num = float(clean_value)
-                if 0 < num < 100000:
-                    price_count += 1
-            except ValueError:
-                continue
-        return price_count / len(values) if values else 0
-    
-    def _is_status_column(self, values: List[str]) -> float:
-        """Check if values are status indicators"""
-        status_words = {'active', 'inactive', 'draft', 'published', 'unpublished', 'true', 'false', 'yes', 'no'}
-        status_count = sum(1 for v in values if v in status_words)
-        return status_count / len(values) if values else 0
-    
-    def _is_size_column(self, values: List[str]) -> float:
-        """Check if values are clothing sizes"""
-        size_patterns = [
-            r'\b(xs|s|m|l|xl|xxl|xxxl)\b',
-            r'\b\d{1,2}\b',
-            r'\b(small|medium|large)\b',
-            r'\b\d{1,2}-\d+\b'
-        ]
-        size_count = 0
-        for value in values:
-            if any(re.search(pattern, value) for pattern in size_patterns):
-                size_count += 1
-        return size_count / len(values) if values else 0
-    
-    def _is_color_column(self, values: List[str]) -> float:
-        """Check if values are colors"""
-        color_words = {
-            'red', 'blue', 'green', 'yellow', 'black', 'white', 'pink', 'purple',
-            'orange', 'brown', 'gray', 'grey', 'navy', 'maroon', 'teal', 'cyan'
-        }
-        color_count = sum(1 for v in values if any(color in v for color in color_words))
-        return color_count / len(values) if values else 0
-    
-    def _is_category_column(self, values: List[str]) -> float:
-        """Check if values are product categories"""
-        category_words = {
-            'shirt', 'dress', 'pants', 'jeans', 'jacket', 'shoes', 'bag',
-            'jewelry', 'clothing', 'apparel', 'accessories', 'footwear'
-        }
-        category_count = sum(1 for v in values if any(cat in v for cat in category_words))
-        return category_count / len(values) if values else 0
-    
-    def _is_code_column(self, values: List[str], column_name: str) -> float:
-        """Check if values are product codes/SKUs"""
-        name_hints = ['sku', 'code', 'id', 'number', 'ref']
-        name_bonus = 0.3 if any(hint in column_name for hint in name_hints) else 0
-        
-        code_count = 0
-        for value in values:
-            if re.match(r'^[A-Za-z0-9_-]+$', value.strip()) and len(value.strip()) > 2:
-                code_count += 1
-        
-        base_score = code_count / len(values) if values else 0
-        return min(1.0, base_score + name_bonus)
-    
-    
     def _get_column_variants(self) -> Dict[str, List[str]]:
         """Get all column name variations for mapping - COMPLETE SHOPIFY COLUMNS"""
         return {
@@ -1,104 +1,121 @@
-# helpers/description_generator.py - FIXED: HTML tags only on labels
+# helpers/description_generator.py - Description builder template engine
+"""
+The description builder's elements are compiled once into a DescriptionTemplate,
+which renders the HTML for a whole frame column by column. The live preview,
+data processing and CSV export all render through it, so they always agree.
+
+Descriptions are rendered once per source product and joined onto its variant
+rows; DescriptionGenerator keeps them in session state keyed by the template
+signature, so the export only re-renders after the builder elements change.
+"""
+import hashlib
+import json
+import numpy as np
 import pandas as pd
 import streamlit as st
 
+class DescriptionTemplate:
+    """Compiled description elements - each one a (column, prefix, suffix) around the cell value"""
+    
+    def __init__(self, description_elements: list):
+        elements = sorted([elem for elem in description_elements if elem.get('column')],
+                          key=lambda x: x.get('order', 0))
+        self.parts = [(elem['column'],) + self._compile_element(elem) for elem in elements]
+        self.signature = hashlib.sha1(json.dumps(self.parts, default=str).encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def _compile_element(element: dict) -> tuple:
+        """HTML before and after the value: user tags wrap the label only, a paragraph wraps everything"""
+        label = element.get('label', '')
+        html_tag = element.get('html_tag', 'p')
+        
+        if label and label.strip():
+            if html_tag == 'none':
+                return f"{label}: ", ""
+            if html_tag == 'br':
+                return f"{label}: ", "<br>"
+            if html_tag == 'li':
+                return f"<li>{label}: ", "</li>"
+            if html_tag == 'p':
+                return f"<p>{label}: ", "</p>"
+            return f"<p><{html_tag}>{label} : </{html_tag}> ", "</p>"
+        
+        if html_tag == 'none':
+            return "", ""
+        if html_tag == 'br':
+            return "", "<br>"
+        if html_tag == 'li':
+            return "<li>", "</li>"
+        if html_tag == 'p':
+            return "<p>", "</p>"
+        return f"<p><{html_tag}>", f"</{html_tag}></p>"
+    
+    @staticmethod
+    def _column_text(series: pd.Series) -> np.ndarray:
+        """Stripped text of each cell, "" for missing values"""
+        text = np.full(len(series), "", dtype=object)
+        present = series.notna().to_numpy()
+        if present.any():
+            values = series[present]
+            if not pd.api.types.is_string_dtype(values):
+                values = values.astype(object).map(str)
+            text[present] = values.str.strip().to_numpy(dtype=object)
+        return text
+    
+    def render(self, df: pd.DataFrame) -> pd.Series:
+        """Description HTML for every row - elements with an empty value are left out"""
+        started = np.zeros(len(df), dtype=bool)
+        pieces = []
+        
+        for column, prefix, suffix in self.parts:
+            if column not in df.columns:
+                continue
+            values = self._column_text(df[column])
+            filled = values != ""
+            if not filled.any():
+                continue
+            values[filled] = prefix + values[filled] + suffix
+            # Elements are separated by a space, counted only between non-empty ones
+            pieces.append(np.where(filled & started, " ", ""))
+            pieces.append(values)
+            started |= filled
+        
+        html = ["".join(row) for row in zip(*(piece.tolist() for piece in pieces))] if pieces else [""] * len(df)
+        return pd.Series(html, index=df.index, dtype=object)
+
 class DescriptionGenerator:
     """Unified description generator - ONLY dynamic description builder"""
     
-    def apply_enhanced_descriptions(self, df: pd.DataFrame, column_mapping: dict, column_descriptions: dict = None) -> pd.DataFrame:
-        """Apply dynamic HTML descriptions from description builder"""
+    def product_descriptions(self, df_raw: pd.DataFrame, description_elements: list) -> pd.Series:
+        """Description of every source product, cached until the elements or the file change"""
+        template = DescriptionTemplate(description_elements)
+        cache = st.session_state.get('description_cache')
+        if cache and cache['signature'] == template.signature and cache['source'] is df_raw:
+            return cache['descriptions']
+        
+        descriptions = template.render(df_raw)
+        st.session_state.description_cache = {
+            'signature': template.signature,
+            'source': df_raw,
+            'descriptions': descriptions,
+        }
+        return descriptions
+    
+    def apply_enhanced_descriptions(self, df: pd.DataFrame, df_raw: pd.DataFrame, description_elements: list) -> pd.DataFrame:
+        """Attach each source product's description to its variant rows as enhanced_description"""
+        if not description_elements:
+            return df
+        
         try:
-            # Get description elements from session state
-            description_elements = st.session_state.get('description_elements', [])
-            
-            if not description_elements:
-                # No description elements defined, return as is
-                return df
-            
-            # Generate descriptions using dynamic system
-            df['enhanced_description'] = df.apply(
-                lambda row: self._generate_dynamic_description(description_elements, row),
-                axis=1
-            )
-            
-            # Update column mapping to use enhanced descriptions
-            column_mapping['Body (HTML)'] = 'enhanced_description'
-            
+            if df_raw.index.is_unique:
+                # Variant rows keep the index label of the source row they were exploded from
+                descriptions = self.product_descriptions(df_raw, description_elements)
+                df['enhanced_description'] = descriptions.reindex(df.index).to_numpy()
+            else:
+                df['enhanced_description'] = DescriptionTemplate(description_elements).render(df)
             return df
-            
+        
         except Exception as e:
             st.warning(f"Description generation failed: {str(e)}. Using empty descriptions.")
             df['enhanced_description'] = ""
             return df
-    
-    def _generate_dynamic_description(self, description_elements: list, row: pd.Series) -> str:
-        """FIXED: Apply HTML tags ONLY to label, each element on new line"""
-        try:
-            # Sort elements by order
-            sorted_elements = sorted([elem for elem in description_elements if elem.get('column')], 
-                                key=lambda x: x.get('order', 0))
-            
-            html_parts = []
-            
-            for element in sorted_elements:
-                column = element.get('column', '')
-                label = element.get('label', '')
-                html_tag = element.get('html_tag', 'p')
-                
-                if column and column in row.index:
-                    value = self._clean_value_no_decimals(row[column], column)
-                    if value:
-                        if label and label.strip():
-                            # FIXED: Apply HTML tag ONLY to label, then add value without tags
-                            if html_tag == 'none':
-                                html_parts.append(f"{label}: {value}")
-                            elif html_tag == 'br':
-                                html_parts.append(f"{label}: {value}<br>")
-                            elif html_tag == 'li':
-                                html_parts.append(f"<li>{label}: {value}</li>")
-                            else:
-                                # HTML tag wraps ONLY the label
-                                html_parts.append(f"<p><{html_tag}>{label} : </{html_tag}> {value}</p>")
-                        else:
-                            # No label - just value with HTML tag
-                            if html_tag == 'none':
-                                html_parts.append(value)
-                            elif html_tag == 'br':
-                                html_parts.append(f"{value}<br>")
-                            elif html_tag == 'li':
-                                html_parts.append(f"<li>{value}</li>")
-                            else:
-                                html_parts.append(f"<p><{html_tag}>{value}</{html_tag}></p>")
-            
-            return " ".join(html_parts) if html_parts else ""
-            
-        except Exception as e:
-            return ""
-    
-    def _clean_value_no_decimals(self, value, column_name: str = '') -> str:
-        """FIXED: Remove decimals from ALL numeric values that should be integers"""
-        if pd.isna(value) or str(value).strip() == '':
-            return ""
-        
-        # Fields that should ALWAYS be integers (no decimals)
-        integer_fields = [
-            'no of components', 'components', 'number_of_components', 
-            'component_count', 'quantity', 'qty', 'count', 'pieces',
-            'set', 'items', 'number', 'no'
-        ]
-        
-        column_lower = column_name.lower() if column_name else ''
-        should_be_integer = any(field in column_lower for field in integer_fields)
-        
-        # Try to convert to number and remove decimal if needed
-        try:
-            num_value = float(str(value).strip())
-            # If it's a whole number OR should be integer field, remove decimal
-            if should_be_integer or num_value == int(num_value):
-                return str(int(num_value))
-            else:
-                # Keep as is for actual decimal values (like prices)
-                return str(value).strip()
-        except (ValueError, TypeError):
-            # Not a number, return as string
-            return str(value).strip()
\ No newline at end of file
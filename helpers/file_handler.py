@@ -1,13 +1,45 @@
 # helpers/file_handler.py - Simple file handling utility
+import io
+import tempfile
+import time
 import pandas as pd
+from config.constants import CSV_EXPORT_CHUNK_ROWS, CSV_EXPORT_SPOOL_MB
 
 class FileHandler:
     """Simple file loading utility"""
     
+    # Stats of the most recent load_file call: rows, seconds, rows_per_sec
+    last_load_stats = None
+    
     @staticmethod
     def load_file(uploaded_file):
         """Load CSV or Excel file"""
+        start = time.perf_counter()
         if uploaded_file.name.lower().endswith(".xlsx"):
-            return pd.read_excel(uploaded_file)
+            df = pd.read_excel(uploaded_file)
         else:
-            return pd.read_csv(uploaded_file)
+            df = pd.read_csv(uploaded_file)
+        
+        seconds = time.perf_counter() - start
+        FileHandler.last_load_stats = {
+            'rows': len(df),
+            'seconds': seconds,
+            'rows_per_sec': len(df) / seconds if seconds > 0 else 0.0
+        }
+        return df
+    
+    @staticmethod
+    def write_csv(df, chunk_rows=CSV_EXPORT_CHUNK_ROWS):
+        """Write a DataFrame as UTF-8 CSV, block by block, into a spooled temp file
+        
+        Small exports stay in memory, large ones spill to disk, so the full CSV
+        text is never held as one string. The returned file is rewound and
+        ready to read.
+        """
+        csv_file = tempfile.SpooledTemporaryFile(max_size=CSV_EXPORT_SPOOL_MB * 1024 * 1024)
+        text_stream = io.TextIOWrapper(csv_file, encoding="utf-8", newline="")
+        df.to_csv(text_stream, index=False, chunksize=chunk_rows)
+        text_stream.flush()
+        text_stream.detach()
+        csv_file.seek(0)
+        return csv_file
@@ -0,0 +1,140 @@
+# helpers/mapping_store.py - Saved column mappings keyed by header layout
+"""
+A confirmed column mapping is saved under a signature of the file's header
+set, so the next file with the same layout (same columns, in any order, any
+case or spacing) gets its mapping back without column analysis. The least
+recently used profiles are dropped beyond MAPPING_STORE_MAX_PROFILES.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import streamlit as st
+from config.constants import MAPPING_STORE_PATH, MAPPING_STORE_MAX_PROFILES
+
+class MappingStore:
+    """SQLite store of mapping profiles, safe to share between sessions"""
+    
+    def __init__(self, path=MAPPING_STORE_PATH, max_profiles=MAPPING_STORE_MAX_PROFILES):
+        self.path = path
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+        self._conn = None
+        
+        try:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS profiles ("
+                " signature TEXT PRIMARY KEY, headers TEXT NOT NULL, mapping TEXT NOT NULL,"
+                " saved REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS profiles_last_used ON profiles (last_used)")
+            self._conn.commit()
+        except (sqlite3.Error, OSError):
+            # Unwritable location - mappings are simply not remembered
+            self._conn = None
+    
+    @staticmethod
+    def normalize_header(column):
+        """Case- and whitespace-insensitive form of a column name"""
+        return " ".join(str(column).lower().split())
+    
+    @classmethod
+    def header_signature(cls, columns):
+        """Identity of a header layout - independent of column order, case and spacing"""
+        headers = sorted({cls.normalize_header(column) for column in columns})
+        return hashlib.sha256("\x1f".join(headers).encode("utf-8")).hexdigest()
+    
+    def is_enabled(self):
+        """Check if the store database is available"""
+        return self._conn is not None
+    
+    def lookup(self, columns):
+        """Saved {field: column} mapping for this header layout, in this file's column names - or None"""
+        signature = self.header_signature(columns)
+        with self._lock:
+            if self._conn is None:
+                return None
+            try:
+                row = self._conn.execute("SELECT mapping FROM profiles WHERE signature = ?", (signature,)).fetchone()
+                if row is None:
+                    return None
+                self._conn.execute("UPDATE profiles SET last_used = ? WHERE signature = ?", (time.time(), signature))
+                self._conn.commit()
+            except sqlite3.Error:
+                return None
+        
+        # Profiles store normalized names; map them back to this file's spelling
+        actual = {self.normalize_header(column): column for column in columns}
+        return {field: actual[column] for field, column in json.loads(row[0]).items() if column in actual}
+    
+    def save(self, columns, mapping):
+        """Remember a confirmed mapping for this header layout"""
+        headers = sorted({self.normalize_header(column) for column in columns})
+        stored = {field: self.normalize_header(column) for field, column in mapping.items() if column}
+        self._put([(self.header_signature(columns), headers, stored, time.time())])
+    
+    def export_profiles(self):
+        """All profiles as a JSON document, for import elsewhere"""
+        with self._lock:
+            if self._conn is None:
+                return json.dumps({'profiles': []})
+            try:
+                rows = self._conn.execute(
+                    "SELECT headers, mapping, saved FROM profiles ORDER BY last_used DESC"
+                ).fetchall()
+            except sqlite3.Error:
+                rows = []
+        profiles = [{'headers': json.loads(headers), 'mapping': json.loads(mapping), 'saved': saved}
+                    for headers, mapping, saved in rows]
+        return json.dumps({'profiles': profiles}, indent=2)
+    
+    def import_profiles(self, document):
+        """Add profiles from an export_profiles document - returns how many were imported"""
+        profiles = json.loads(document).get('profiles', [])
+        entries = []
+        for profile in profiles:
+            headers = sorted({self.normalize_header(column) for column in profile['headers']})
+            mapping = {field: self.normalize_header(column) for field, column in profile['mapping'].items() if column}
+            entries.append((self.header_signature(headers), headers, mapping, profile.get('saved', time.time())))
+        self._put(entries)
+        return len(entries)
+    
+    def stats(self):
+        """Number of saved profiles"""
+        with self._lock:
+            if self._conn is None:
+                return {'profiles': 0}
+            try:
+                return {'profiles': self._conn.execute("SELECT COUNT(*) FROM profiles").fetchone()[0]}
+            except sqlite3.Error:
+                return {'profiles': 0}
+    
+    def _put(self, entries):
+        """Upsert (signature, headers, mapping, saved) entries, then evict least recently used profiles"""
+        now = time.time()
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO profiles (signature, headers, mapping, saved, last_used) VALUES (?, ?, ?, ?, ?)",
+                    [(signature, json.dumps(headers), json.dumps(mapping), saved, now)
+                     for signature, headers, mapping, saved in entries]
+                )
+                self._conn.execute(
+                    "DELETE FROM profiles WHERE signature NOT IN "
+                    "(SELECT signature FROM profiles ORDER BY last_used DESC LIMIT ?)", (self.max_profiles,)
+                )
+                self._conn.commit()
+            except sqlite3.Error:
+                pass
+
+@st.cache_resource
+def get_mapping_store():
+    """Process-wide mapping store - opened once, not on every rerun"""
+    return MappingStore()
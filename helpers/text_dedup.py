@@ -0,0 +1,69 @@
+# helpers/text_dedup.py - Group identical and near-identical descriptions
+import re
+import zlib
+import numpy as np
+
+_WORD = re.compile(r"\w+")
+
+# MinHash parameters: 64 hashes split into 16 LSH bands of 4 rows
+_NUM_HASHES = 64
+_BAND_ROWS = 4
+_PRIME = 4294967311  # first prime above 2**32
+_rng = np.random.default_rng(20240917)
+_HASH_A = _rng.integers(1, 2 ** 31, _NUM_HASHES, dtype=np.uint64)
+_HASH_B = _rng.integers(0, 2 ** 31, _NUM_HASHES, dtype=np.uint64)
+
+def normalize_description(text):
+    """Case- and whitespace-insensitive form of a description"""
+    return " ".join(str(text).lower().split())
+
+def group_descriptions(texts, near_duplicate_threshold=None):
+    """Representative index per text - texts that share one need only one AI request
+    
+    Texts equal after normalize_description always share a representative (the
+    first of them). With near_duplicate_threshold (0-1), texts whose estimated
+    Jaccard similarity of word 3-shingles reaches it are grouped as well.
+    """
+    representatives = list(range(len(texts)))
+    first_by_text = {}
+    for i, text in enumerate(texts):
+        representatives[i] = first_by_text.setdefault(normalize_description(text), i)
+    
+    if near_duplicate_threshold:
+        unique = sorted(set(representatives))
+        near = _near_duplicate_groups([texts[i] for i in unique], near_duplicate_threshold)
+        remap = {unique[i]: unique[near[i]] for i in range(len(unique))}
+        representatives = [remap[rep] for rep in representatives]
+    
+    return representatives
+
+def _near_duplicate_groups(texts, threshold):
+    """Union-find over MinHash LSH candidates - returns the group root (smallest index) per text"""
+    signatures = np.array([_minhash(text) for text in texts]) if texts else np.empty((0, _NUM_HASHES))
+    parent = list(range(len(texts)))
+    
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    
+    # Texts that agree on every row of any band are candidates; confirm on the full signature
+    for start in range(0, _NUM_HASHES, _BAND_ROWS):
+        buckets = {}
+        for i, signature in enumerate(signatures):
+            buckets.setdefault(signature[start:start + _BAND_ROWS].tobytes(), []).append(i)
+        for members in buckets.values():
+            for other in members[1:]:
+                a, b = find(members[0]), find(other)
+                if a != b and np.mean(signatures[members[0]] == signatures[other]) >= threshold:
+                    parent[max(a, b)] = min(a, b)
+    
+    return [find(i) for i in range(len(texts))]
+
+def _minhash(text):
+    """MinHash signature of the word 3-shingles of a text"""
+    words = _WORD.findall(normalize_description(text))
+    shingles = {" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))}
+    hashes = np.array([zlib.crc32(shingle.encode("utf-8")) for shingle in shingles], dtype=np.uint64)
+    return ((np.outer(_HASH_A, hashes) + _HASH_B[:, None]) % _PRIME).min(axis=1)
@@ -3,17 +3,10 @@ import pandas as pd
 import numpy as np
 import re
 from difflib import SequenceMatcher
+from config.constants import STANDARD_SIZE_ORDER
+from helpers.file_handler import FileHandler  # kept importable from here for older callers
 
-class FileHandler:
-    """Handle file operations"""
-    
-    @staticmethod
-    def load_file(uploaded_file):
-        """Load CSV or Excel file"""
-        if uploaded_file.name.lower().endswith(".xlsx"):
-            return pd.read_excel(uploaded_file)
-        else:
-            return pd.read_csv(uploaded_file)
+_STANDARD_SIZE_RANKS = {size.upper(): idx for idx, size in enumerate(STANDARD_SIZE_ORDER)}
 
 class ConfigManager:
     """Manage configuration settings"""
@@ -97,6 +90,49 @@ def clean_value(value, is_numeric=False, default_numeric=0):
     
     return str(value).strip()
 
+def get_column_series(df, column_mapping, standard_name, default=""):
+    """Column-wise get_column_value: the mapped column, or a Series of the default"""
+    actual_column = column_mapping.get(standard_name)
+    if actual_column and actual_column in df.columns:
+        return df[actual_column]
+    return pd.Series(default, index=df.index, dtype=object)
+
+def fallback_series(primary, fallback):
+    """Column-wise `primary or fallback` - falsy values ('', 0, None) take the fallback"""
+    primary = primary.astype(object)
+    is_truthy = primary.to_numpy(dtype=object).astype(bool)
+    return primary.where(is_truthy, fallback.astype(object))
+
+def clean_series(series):
+    """Column-wise clean_value for text values - blanks and NaN become ''"""
+    values = series.astype(object)
+    text = values.astype(str).str.strip()
+    is_blank = values.isna() | values.isin(['nan', 'NaN']) | (text == '')
+    return text.mask(is_blank, '')
+
+def clean_numeric_series(series, default_numeric=0):
+    """Column-wise clean_value(..., is_numeric=True) - whole numbers become ints"""
+    if pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+        numbers = series.to_numpy(dtype=float, copy=True)
+    else:
+        # Parse each distinct value once, exactly as float() would
+        codes, uniques = pd.factorize(series.astype(object).astype(str).str.strip(), use_na_sentinel=False)
+        parsed = np.array([_parse_float(value) for value in uniques], dtype=float)
+        numbers = parsed[codes] if len(codes) else np.array([], dtype=float)
+    numbers[~np.isfinite(numbers)] = default_numeric
+
+    values = numbers.astype(object)
+    is_whole = numbers % 1 == 0
+    values[is_whole] = numbers[is_whole].astype(np.int64).astype(object)
+    return pd.Series(values, index=series.index, dtype=object)
+
+def _parse_float(text):
+    """float() that returns NaN instead of raising"""
+    try:
+        return float(text)
+    except (ValueError, TypeError):
+        return np.nan
+
 def safe_get_column_data(df, column_mapping, standard_name, default_value=""):
     """Safely get column data with fallback to direct column access"""
     # Try normalized column mapping first
@@ -118,8 +154,6 @@ def safe_get_column_data(df, column_mapping, standard_name, default_value=""):
 
 def sort_sizes_with_quantities(sizes_list):
     """Sort sizes and extract quantities - NO DECIMALS"""
-    standard_order = ['XXS', 'XS', 'S', 'M', 'L', 'XL', 'XXL', 'XXXL', '2XL', '3XL', '4XL', '5XL']
-    
     # Split and clean sizes
     size_strings = [s.strip() for s in str(sizes_list).split(',') if s.strip()]
     
@@ -140,43 +174,24 @@ def sort_sizes_with_quantities(sizes_list):
             unique_sizes.append(size)
             seen.add(size)
     
-    # Separate standard, numeric, and custom sizes
-    standard_sizes = []
-    numeric_sizes = []
-    custom_sizes = []
-    
-    for size in unique_sizes:
-        matched = False
-        for idx, std_size in enumerate(standard_order):
-            if size.upper() == std_size.upper():
-                standard_sizes.append((idx, size))
-                matched = True
-                break
-        
-        if not matched:
-            if re.match(r'^\d+$', size):
-                numeric_sizes.append((int(size), size))
-            elif re.match(r'^X\d+', size.upper()):
-                numbers = re.findall(r'\d+', size)
-                if numbers:
-                    numeric_sizes.append((int(numbers[0]), size))
-                else:
-                    custom_sizes.append(size)
-            else:
-                custom_sizes.append(size)
-    
-    # Sort each category
-    standard_sizes.sort(key=lambda x: x[0])
-    numeric_sizes.sort(key=lambda x: x[0])
-    custom_sizes.sort()
-    
-    # Combine
-    sorted_sizes = ([size for _, size in standard_sizes] + 
-                   [size for _, size in numeric_sizes] + 
-                   custom_sizes)
+    # Standard sizes first, then numeric sizes, then custom sizes alphabetically
+    sorted_sizes = sorted(unique_sizes, key=size_sort_key)
     
     return sorted_sizes, size_quantity_map
 
+def size_sort_key(size):
+    """Sort key for a single size: standard sizes, then numeric sizes, then custom sizes"""
+    upper_size = size.upper()
+    if upper_size in _STANDARD_SIZE_RANKS:
+        return (0, _STANDARD_SIZE_RANKS[upper_size], '')
+    
+    if re.match(r'^\d+$', size):
+        return (1, int(size), '')
+    if re.match(r'^X\d+', upper_size):
+        return (1, int(re.findall(r'\d+', size)[0]), '')
+    
+    return (2, 0, size)
+
 def parse_size_and_quantity(size_string):
     """Parse size string to extract size and quantity - NO DECIMALS"""
     size_string = str(size_string).strip()
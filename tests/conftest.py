@@ -0,0 +1,26 @@
+# tests/conftest.py - Make the app packages importable when running pytest from anywhere
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class FakeClock:
+    """Clock that only moves when something sleeps on it"""
+    
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+    
+    def __call__(self):
+        return self.now
+    
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock():
+    """A fresh FakeClock for rate limit and retry tests"""
+    return FakeClock()
@@ -0,0 +1,212 @@
+# tests/test_ai_service.py - AIService against a local fake model
+import json
+import random
+import threading
+import time
+import pandas as pd
+import pytest
+from config.constants import AI_RETRY_ATTEMPTS
+from config.settings import AppSettings
+from backend.ai_cache import AICache
+from backend.ai_journal import AIJournal
+from backend.ai_service import AIService
+from backend.rate_limiter import RateLimiter
+
+SIMPLE = "Simple mode (first sentence + tags)"
+FULL = "Full AI mode (custom description + tags)"
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+class FakeModel:
+    """Stands in for the Gemini model: random latency, records concurrency, fails prompts containing fail_on"""
+    
+    def __init__(self, latency=0.02, fail_on=None, seed=0):
+        self.latency = latency
+        self.fail_on = fail_on
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+    
+    def generate_content(self, prompt, **kwargs):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            delay = self.latency * self._random.uniform(0.2, 2.0)
+        try:
+            time.sleep(delay)
+            if self.fail_on and self.fail_on in prompt:
+                raise RuntimeError("model error")
+            return FakeResponse(self._reply(prompt))
+        finally:
+            with self._lock:
+                self.active -= 1
+    
+    def _reply(self, prompt):
+        if "Products (JSON): " in prompt:
+            items = json.loads(prompt.split("Products (JSON): ", 1)[1].split("\n\n", 1)[0])
+            return json.dumps([{"id": item["id"], "description": f"Enhanced {item['description']}", "tags": "a,b"}
+                               for item in items])
+        if "Original: " in prompt:
+            text = prompt.split("Original: ", 1)[1].split("\n", 1)[0]
+            return f"Enhanced {text}\na,b"
+        text = prompt.split("Text: ", 1)[1].split("\n", 1)[0]
+        return f"tag-{text}"
+
+def make_service(model, max_workers=4):
+    """Service with in-memory cache and journal and no rate limits"""
+    return AIService(model=model, max_workers=max_workers, cache=AICache(":memory:"),
+                     rate_limiter=RateLimiter(0, 0), journal=AIJournal(":memory:"))
+
+def make_products(count):
+    return pd.DataFrame({
+        "Handle": [f"product-{i}" for i in range(count)],
+        "Description": [f"Product number {i}. Second sentence." for i in range(count)],
+    })
+
+def test_results_come_back_in_input_order():
+    df = make_products(40)
+    result = make_service(FakeModel(), max_workers=8).enhance_descriptions(df, {"description": "Description"}, SIMPLE)
+    
+    assert result["custom_description"].tolist() == [f"Product number {i}" for i in range(40)]
+    assert result["ai_tags"].tolist() == [f"tag-Product number {i}" for i in range(40)]
+
+def test_at_most_max_workers_requests_in_flight():
+    model = FakeModel(latency=0.03)
+    make_service(model, max_workers=3).enhance_descriptions(make_products(30), {"description": "Description"}, SIMPLE)
+    
+    assert model.calls == 30
+    assert 1 < model.max_active <= 3
+
+def test_failed_row_keeps_original_text():
+    df = make_products(6)
+    service = make_service(FakeModel(fail_on="Product number 4"))
+    result = service.enhance_descriptions(df, {"description": "Description"}, FULL)
+    
+    assert result.loc[4, "custom_description"] == "Product number 4. Second sentence."
+    assert result.loc[4, "ai_tags"] == ""
+    assert result.loc[3, "custom_description"] == "Enhanced Product number 3. Second sentence."
+    assert service.last_run["failed"] == 1
+
+def test_simple_mode_duplicates_keep_their_own_first_sentence():
+    df = pd.DataFrame({
+        "Handle": ["a", "b", "c"],
+        "Description": ["Nice dress. Pure silk.", "nice  DRESS.  pure SILK.", "Nice dress. Pure silk."],
+    })
+    model = FakeModel()
+    service = make_service(model)
+    result = service.enhance_descriptions(df, {"description": "Description"}, SIMPLE)
+    
+    # One tags request for the group; each product keeps its own first sentence
+    assert model.calls == 1
+    assert result["custom_description"].tolist() == ["Nice dress", "nice  DRESS", "Nice dress"]
+    assert result["ai_tags"].nunique() == 1
+    assert service.last_run["saved_calls"] == 2
+
+class NoBatchModel(FakeModel):
+    """Answers single requests only - batched replies are unusable, so every item falls back"""
+    
+    def _reply(self, prompt):
+        if "Products (JSON): " in prompt:
+            return "Sorry, I can't do that."
+        return super()._reply(prompt)
+
+def test_batch_fallback_counts_each_cache_miss_once():
+    df = make_products(4)
+    model = NoBatchModel()
+    service = make_service(model)
+    
+    result = service.enhance_descriptions(df.copy(), {"description": "Description"}, FULL)
+    assert result["custom_description"].tolist() == [f"Enhanced Product number {i}. Second sentence." for i in range(4)]
+    assert (service.last_run["cache_hits"], service.last_run["cache_misses"]) == (0, 4)
+    assert model.calls == 5  # the batch, then one request per item
+    
+    service.enhance_descriptions(df.copy(), {"description": "Description"}, FULL)
+    assert (service.last_run["cache_hits"], service.last_run["cache_misses"]) == (4, 0)
+    assert model.calls == 5
+
+def test_disabled_service_opens_no_backends(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    service = AIService()
+    
+    assert not service.is_enabled()
+    assert not (tmp_path / ".cache").exists()
+
+def test_failed_model_setup_leaves_descriptions_unchanged(monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr("backend.ai_service._gemini_model", lambda api_key: 1 / 0)
+    service = AIService(cache=AICache(":memory:"), rate_limiter=RateLimiter(0, 0), journal=AIJournal(":memory:"))
+    df = make_products(3)
+    
+    result = service.process_descriptions(df, {"description": "Description"}, FULL)
+    assert result is df
+    assert "custom_description" not in result.columns
+    assert not service.is_enabled()
+
+class APIError(Exception):
+    """Error carrying an HTTP status, like the SDK's API errors"""
+    
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+class ScriptedModel:
+    """Raises the scripted errors in turn, then answers"""
+    
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+    
+    def generate_content(self, prompt, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return FakeResponse("ok")
+
+def make_retry_service(model, clock):
+    return AIService(model=model, cache=AICache(":memory:"), journal=AIJournal(":memory:"),
+                     rate_limiter=RateLimiter(0, 0, clock=clock, sleep=clock.sleep))
+
+def test_rate_limit_and_server_errors_are_retried_with_backoff(clock):
+    model = ScriptedModel([APIError(429), APIError(503), APIError(500)])
+    service = make_retry_service(model, clock)
+    
+    assert service._call_model("prompt", "tags").text == "ok"
+    assert model.calls == 4
+    assert service.usage.retries == 3
+    assert len(clock.sleeps) == 3
+    for attempt, delay in enumerate(clock.sleeps):
+        assert 0 <= delay <= min(AppSettings.AI_RETRY_MAX_DELAY, AppSettings.AI_RETRY_BASE_DELAY * 2 ** attempt)
+    assert service.usage.errors == 3
+
+def test_client_error_fails_without_retry(clock):
+    model = ScriptedModel([APIError(400)])
+    service = make_retry_service(model, clock)
+    
+    with pytest.raises(APIError):
+        service._call_model("prompt", "tags")
+    assert model.calls == 1
+    assert service.usage.retries == 0
+    assert service.usage.errors == 1
+    assert clock.sleeps == []
+
+def test_gives_up_after_retry_attempts(clock):
+    model = ScriptedModel([APIError(503)] * (AI_RETRY_ATTEMPTS + 5))
+    service = make_retry_service(model, clock)
+    
+    with pytest.raises(APIError):
+        service._call_model("prompt", "tags")
+    assert model.calls == AI_RETRY_ATTEMPTS + 1
+    assert len(clock.sleeps) == AI_RETRY_ATTEMPTS
+
+@pytest.mark.parametrize("error, retryable", [
+    (APIError(429), True), (APIError(502), True), (APIError(404), False),
+    (TimeoutError(), True), (ConnectionError(), True), (ValueError("bad"), False),
+])
+def test_is_retryable(error, retryable, clock):
+    assert make_retry_service(ScriptedModel([]), clock)._is_retryable(error) is retryable
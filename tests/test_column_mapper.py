@@ -0,0 +1,20 @@
+# tests/test_column_mapper.py - Content analysis on sampled column values
+import numpy as np
+import pandas as pd
+from helpers.column_mapper import ColumnMapper
+
+def test_sparse_column_is_still_profiled():
+    rows = 20000
+    df = pd.DataFrame({'Name': [f"Item {i}" for i in range(rows)], 'Attr': [None] * rows})
+    # 40 filled cells, none of them where an evenly spaced 200-row sample would land
+    df.loc[np.arange(40) * 499 + 50, 'Attr'] = "Red"
+    
+    assert ColumnMapper().analyze_columns(df).base_mapping.get('colour') == 'Attr'
+
+def test_sample_is_spread_over_filled_values():
+    df = pd.DataFrame({'Attr': [np.nan] * 500 + [f"V{i}" for i in range(1000)]})
+    values = ColumnMapper(sample_rows=10)._sample_values(df, ['Attr'])
+    
+    assert len(values) == 10
+    assert values['value'].iloc[0] == "V0"
+    assert values['value'].iloc[-1] == "V999"
@@ -0,0 +1,182 @@
+# tests/test_data_processor.py - Variant explosion and size surcharges
+import random
+import numpy as np
+import pandas as pd
+import pytest
+from backend.data_processor import DataProcessor
+from helpers.utils import get_column_value, clean_value, size_sort_key, sort_sizes_with_quantities
+
+SIZES = ["XS", "S", "M", "L", "XL", "XXL", "2XL", "s", "10", "12", "8", "X12", "Free", "Custom", "custom",
+         "M-5-6", "L-x", ""]
+COLOURS = ["Red", "Blue", " Green ", "Black", "White", "Navy", "", "Pink"]
+
+MAPPING = {
+    "Title": "Product Title",
+    "Body (HTML)": "Description",
+    "Option1 Value": "Size",
+    "Option2 Value": "Colour",
+    "Variant SKU": "Product code",
+    "Variant Price": "Price",
+    "Variant Compare At Price": "Compare Price",
+    "published": "Status",
+}
+LEGACY_MAPPING = {**{k: v for k, v in MAPPING.items()
+                     if k not in ("Option1 Value", "Option2 Value", "Variant Compare At Price")},
+                  "size": "Size", "colour": "Colour"}
+
+CONFIGS = [
+    {},
+    {"bulk_qty_mode": True, "bulk_qty": 7},
+    {"use_expected_qty": False, "default_qty": 4},
+    {"fallback_qty": 3},
+    {"bulk_compare_price_mode": True, "bulk_compare_price": 99.5},
+    {"use_expected_compare_price": False, "default_compare_price": 12.0},
+]
+
+class RowWiseVariants:
+    """Reference: the iterrows implementation _process_variants replaced"""
+    
+    def process_variants(self, df_raw, column_mapping, config):
+        df_exploded_list = []
+        
+        for _, row in df_raw.iterrows():
+            sizes_value = (get_column_value(row, column_mapping, 'Option1 Value', '') or
+                           get_column_value(row, column_mapping, 'size', ''))
+            colours_value = (get_column_value(row, column_mapping, 'Option2 Value', '') or
+                             get_column_value(row, column_mapping, 'colour', ''))
+            
+            sorted_sizes, size_quantity_map = sort_sizes_with_quantities(clean_value(sizes_value))
+            colors = [c.strip() for c in str(clean_value(colours_value)).split(",") if c.strip()]
+            
+            uploaded_compare_price = self._extract_compare_price(row, column_mapping, config)
+            
+            if not sorted_sizes:
+                sorted_sizes = [""]
+                size_quantity_map = {"": 0}
+            if not colors:
+                colors = [""]
+            
+            for size in sorted_sizes:
+                for color in colors:
+                    new_row = row.copy()
+                    display_size = size.split('-')[0].strip() if size and '-' in size else size
+                    new_row["sizes_list"] = size
+                    new_row["display_size"] = display_size
+                    new_row["colours_list"] = color
+                    new_row["extracted_quantity"] = self._extract_quantity(size, size_quantity_map, config)
+                    new_row["uploaded_compare_price"] = uploaded_compare_price
+                    df_exploded_list.append(new_row)
+        
+        return pd.DataFrame(df_exploded_list)
+    
+    def _extract_quantity(self, size, size_quantity_map, config):
+        if config.get('bulk_qty_mode', False):
+            return config.get('bulk_qty', 10)
+        
+        if config.get('use_expected_qty', True):
+            extracted_qty = size_quantity_map.get(size, 0)
+            if extracted_qty > 0:
+                return extracted_qty
+            return config.get('fallback_qty', config.get('default_qty', 10))
+        
+        return config.get('default_qty', 10)
+    
+    def _extract_compare_price(self, row, column_mapping, config):
+        if config.get('bulk_compare_price_mode', False):
+            return config.get('bulk_compare_price', 0.0)
+        
+        if config.get('use_expected_compare_price', True):
+            compare_price_value = get_column_value(row, column_mapping, 'Variant Compare At Price')
+            if compare_price_value and pd.notna(compare_price_value) and str(compare_price_value).strip() != '':
+                try:
+                    numeric_value = float(str(compare_price_value).strip())
+                    if numeric_value >= 0:
+                        return numeric_value
+                except (ValueError, TypeError):
+                    pass
+            return None
+        
+        return config.get('default_compare_price', 0.0)
+
+def make_linesheet(rows, seed):
+    """Random linesheet with quantity suffixes, blanks, NaNs and mixed value types"""
+    r = random.Random(seed)
+    records = []
+    for i in range(rows):
+        sizes = []
+        for size in r.sample(SIZES, r.randint(0, 5)):
+            sizes.append(f"{size}-{r.randint(0, 20)}" if size and '-' not in size and r.random() < 0.6 else size)
+        records.append({
+            "Product Title": r.choice([f"Dress {i % 17}", f"Top {i % 11}!", "Kurta & Set", None, "None"]),
+            "Description": r.choice(["Lovely dress. Made of silk.", "Soft cotton top", np.nan, ""]),
+            "Colour": np.nan if r.random() < 0.05 else ",".join(r.sample(COLOURS, r.randint(0, 3))),
+            "Product code": r.choice([f"SKU{i % 23}", "", np.nan, "AB-1", 123]),
+            "Size": np.nan if r.random() < 0.05 else ",".join(sizes),
+            "Price": r.choice([1000, 1299.5, "1500", "", np.nan, 0]),
+            "Compare Price": r.choice([np.nan, "", 1999, 2199.99, "0", 0, "abc", " 1800 ", -5]),
+            "Status": r.choice(["active", "Active", "draft", np.nan]),
+        })
+    return pd.DataFrame(records)
+
+@pytest.mark.parametrize("seed", range(2))
+@pytest.mark.parametrize("column_mapping", [MAPPING, LEGACY_MAPPING, {}], ids=["current", "legacy", "unmapped"])
+@pytest.mark.parametrize("config", CONFIGS)
+def test_process_variants_matches_row_wise(seed, column_mapping, config):
+    df = make_linesheet(30, seed)
+    expected = RowWiseVariants().process_variants(df.copy(), column_mapping, config)
+    actual = DataProcessor()._process_variants(df.copy(), column_mapping, config)
+    pd.testing.assert_frame_equal(actual, expected)
+
+def test_process_variants_empty_frame():
+    assert DataProcessor()._process_variants(pd.DataFrame(), MAPPING, {}).empty
+
+@pytest.mark.parametrize("rule, expected", [
+    (">=XL", ('>=', size_sort_key("XL"))),
+    (" <= s ", ('<=', size_sort_key("S"))),
+    (">=xxl", ('>=', size_sort_key("XXL"))),
+    (">=12", ('>=', (1, 12, ''))),
+    ("<=X10", ('<=', (1, 10, ''))),
+    ("XL", None),
+    (">=", None),
+    ("=>XL", None),
+    (">=Free", None),
+    ("<=Custom", None),
+])
+def test_parse_surcharge_tier(rule, expected):
+    assert DataProcessor()._parse_surcharge_tier(rule) == expected
+
+def surcharged_prices(sizes, surcharge_rules, prices=None):
+    df = pd.DataFrame({"display_size": sizes, "Price": prices if prices is not None else [100.0] * len(sizes)})
+    config = {'enable_surcharge': True, 'surcharge_rules': surcharge_rules}
+    result = DataProcessor()._apply_size_surcharges(df, {"Variant Price": "Price"}, config)
+    return dict(zip(sizes, result['final_variant_price'].round(6)))
+
+def test_exact_and_tier_surcharges():
+    rules = {'>=XL': 0.15, '<=S': 0.05, 'XXL': 0.30, '>=10': 0.02, 'FREE': 0.5}
+    prices = surcharged_prices(["XS", "S", "M", "L", "XL", "XXL", "3XL", "8", "10", "12", "Free", "Custom", ""], rules)
+    
+    assert prices == {
+        "XS": 105.0, "S": 105.0,             # <=S tier
+        "M": 100.0, "L": 100.0,              # no rule
+        "XL": 115.0, "3XL": 115.0,           # >=XL tier
+        "XXL": 130.0,                        # exact size beats the tier
+        "8": 100.0, "10": 102.0, "12": 102.0,  # numeric tier only compares numeric sizes
+        "Free": 150.0,                       # unranked size, exact rule only
+        "Custom": 100.0, "": 100.0,          # unranked sizes never fall in a tier
+    }
+
+def test_overlapping_tiers_last_listed_wins():
+    sizes = ["L", "XL", "XXL", "2XL"]
+    
+    assert surcharged_prices(sizes, {'>=XL': 0.10, '>=XXL': 0.20}) == {
+        "L": 100.0, "XL": 110.0, "XXL": 120.0, "2XL": 120.0}
+    assert surcharged_prices(sizes, {'>=XXL': 0.20, '>=XL': 0.10}) == {
+        "L": 100.0, "XL": 110.0, "XXL": 110.0, "2XL": 110.0}
+
+def test_surcharge_sizes_are_case_and_space_insensitive():
+    assert surcharged_prices([" xl ", "xxs"], {'>=XL': 0.10, 'XXS': 0.05}) == {" xl ": 110.0, "xxs": 105.0}
+
+def test_non_positive_prices_are_not_surcharged():
+    prices = surcharged_prices(["XL", "XXL"], {'>=XL': 0.10}, prices=[0.0, -5.0])
+    
+    assert prices == {"XL": 0.0, "XXL": -5.0}
@@ -0,0 +1,95 @@
+# tests/test_description_generator.py - DescriptionTemplate matches the original WorkflowManager HTML
+import numpy as np
+import pandas as pd
+import pytest
+from helpers.description_generator import DescriptionTemplate
+
+HTML_TAGS = ['p', 'h3', 'h4', 'strong', 'li', 'div', 'br', 'none']
+
+def reference_description_html(elements, row):
+    """Reference: WorkflowManager._generate_description_html before the template engine"""
+    html_parts = []
+    
+    for element in elements:
+        column = element.get('column', '')
+        label = element.get('label', '')
+        html_tag = element.get('html_tag', 'p')
+        
+        if column and column in row.index:
+            value = row[column]
+            value = "" if pd.isna(value) or str(value).strip() == '' else str(value).strip()
+            if value:
+                if label and label.strip():
+                    if html_tag == 'none':
+                        html_parts.append(f"{label}: {value}")
+                    elif html_tag == 'br':
+                        html_parts.append(f"{label}: {value}<br>")
+                    elif html_tag == 'li':
+                        html_parts.append(f"<li>{label}: {value}</li>")
+                    elif html_tag == 'p':
+                        html_parts.append(f"<p>{label}: {value}</p>")
+                    else:
+                        html_parts.append(f"<p><{html_tag}>{label} : </{html_tag}> {value}</p>")
+                else:
+                    if html_tag == 'none':
+                        html_parts.append(value)
+                    elif html_tag == 'br':
+                        html_parts.append(f"{value}<br>")
+                    elif html_tag == 'li':
+                        html_parts.append(f"<li>{value}</li>")
+                    elif html_tag == 'p':
+                        html_parts.append(f"<p>{value}</p>")
+                    else:
+                        html_parts.append(f"<p><{html_tag}>{value}</{html_tag}></p>")
+    
+    return " ".join(html_parts)
+
+def reference_render(description_elements, df):
+    sorted_elements = sorted([elem for elem in description_elements if elem.get('column')],
+                             key=lambda x: x.get('order', 0))
+    return [reference_description_html(sorted_elements, row) for _, row in df.iterrows()]
+
+@pytest.fixture
+def products():
+    """Text, NaN, blank, whitespace-only, float, int, bool and datetime cells"""
+    return pd.DataFrame({
+        'Title': ["Silk Dress", "  Kurta  ", "", None, "A & B", "Top"],
+        'Fabric': ["Silk", np.nan, "   ", "Cotton ", "Lawn", np.nan],
+        'Components': [3.0, np.nan, 2.5, 1.0, np.nan, 0.0],
+        'Pieces': [1, 2, 3, 4, 5, 6],
+        'Lined': [True, False, True, False, True, False],
+        'Added': pd.to_datetime(["2024-01-01", "2024-05-06 10:30:00", "2024-01-01",
+                                 "2024-02-02", "2024-03-03", "2024-04-04"], format="ISO8601"),
+    })
+
+@pytest.mark.parametrize("html_tag", HTML_TAGS)
+@pytest.mark.parametrize("label", ["Fabric", " Fabric ", "", "   ", None])
+def test_every_tag_and_label_kind(products, html_tag, label):
+    elements = [{'column': column, 'label': label, 'html_tag': html_tag, 'order': i}
+                for i, column in enumerate(products.columns)]
+    
+    assert DescriptionTemplate(elements).render(products).tolist() == reference_render(elements, products)
+
+@pytest.mark.parametrize("elements", [
+    [],
+    [{'column': '', 'label': 'Empty', 'html_tag': 'p', 'order': 1}],
+    [{'column': 'Missing', 'label': 'Gone', 'html_tag': 'p', 'order': 1},
+     {'column': 'Title', 'label': '', 'html_tag': 'h3', 'order': 2}],
+    # Order decides the sequence; equal orders keep list order
+    [{'column': 'Fabric', 'label': 'Fabric', 'html_tag': 'strong', 'order': 3},
+     {'column': 'Title', 'label': '', 'html_tag': 'h3', 'order': 1},
+     {'column': 'Components', 'label': 'Components', 'html_tag': 'li', 'order': 2},
+     {'column': 'Lined', 'label': 'Lined', 'html_tag': 'br', 'order': 2}],
+    # Same column twice, default tag and order
+    [{'column': 'Title', 'label': 'Name'}, {'column': 'Title', 'html_tag': 'none'}],
+], ids=["no-elements", "no-column", "missing-column", "ordering", "defaults"])
+def test_element_lists(products, elements):
+    assert DescriptionTemplate(elements).render(products).tolist() == reference_render(elements, products)
+
+def test_render_keeps_index(products):
+    products.index = [10, 20, 30, 40, 50, 60]
+    html = DescriptionTemplate([{'column': 'Title', 'label': '', 'html_tag': 'p', 'order': 1}]).render(products)
+    
+    assert html.index.tolist() == [10, 20, 30, 40, 50, 60]
+    assert html.loc[10] == "<p>Silk Dress</p>"
+    assert html.loc[30] == ""
@@ -0,0 +1,33 @@
+# tests/test_file_handler.py - Upload loading and CSV export
+import io
+import pandas as pd
+from helpers.file_handler import FileHandler
+
+CSV = b"Product Title,SKU,No of components\nDress,00123,3\nTop,00456,\nKurta,789,2\n"
+
+def upload(data, name):
+    """In-memory stand-in for a Streamlit UploadedFile"""
+    uploaded = io.BytesIO(data)
+    uploaded.name = name
+    return uploaded
+
+def test_csv_upload_reads_like_read_csv_and_records_stats():
+    df = FileHandler.load_file(upload(CSV, "linesheet.csv"))
+    
+    pd.testing.assert_frame_equal(df, pd.read_csv(io.BytesIO(CSV)))
+    assert FileHandler.last_load_stats['rows'] == 3
+    assert FileHandler.last_load_stats['seconds'] >= 0
+
+def test_xlsx_upload_reads_like_read_excel():
+    expected = pd.read_csv(io.BytesIO(CSV))
+    workbook = io.BytesIO()
+    expected.to_excel(workbook, index=False)
+    
+    df = FileHandler.load_file(upload(workbook.getvalue(), "Linesheet.XLSX"))
+    pd.testing.assert_frame_equal(df, expected)
+
+def test_write_csv_round_trips():
+    df = pd.DataFrame({'Handle': [f"item-{i}" for i in range(12)], 'Body (HTML)': ["<p>a, b</p>"] * 12})
+    
+    csv_file = FileHandler.write_csv(df, chunk_rows=5)
+    pd.testing.assert_frame_equal(pd.read_csv(csv_file), df)
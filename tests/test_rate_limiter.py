@@ -0,0 +1,48 @@
+# tests/test_rate_limiter.py - Request and token limits on a fake clock
+import pytest
+from backend.rate_limiter import RateLimiter, TokenBucket
+
+def test_bucket_refills_at_rate(clock):
+    bucket = TokenBucket(60, clock)  # one per second
+    
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+    clock.now += 10
+    # Refilled 10, the debt of 1 paid back
+    assert bucket.reserve(9) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+
+def test_request_limit_waits_for_the_next_slot(clock):
+    limiter = RateLimiter(2, 0, clock=clock, sleep=clock.sleep)
+    
+    assert limiter.acquire() == 0.0
+    assert limiter.acquire() == 0.0
+    assert limiter.acquire() == pytest.approx(30.0)
+    assert clock.sleeps == [pytest.approx(30.0)]
+    assert limiter.acquire() == pytest.approx(30.0)
+
+def test_token_limit_waits_for_enough_tokens(clock):
+    limiter = RateLimiter(0, 600, clock=clock, sleep=clock.sleep)  # 10 tokens per second
+    
+    assert limiter.acquire(500) == 0.0
+    assert limiter.acquire(300) == pytest.approx(20.0)
+    assert limiter.waited_seconds == pytest.approx(20.0)
+
+def test_wait_is_the_longer_of_both_limits(clock):
+    limiter = RateLimiter(60, 600, clock=clock, sleep=clock.sleep)
+    limiter.acquire(600)
+    
+    # Request bucket still has room; the token bucket needs 30 s for 300 tokens
+    assert limiter.acquire(300) == pytest.approx(30.0)
+
+def test_request_larger_than_the_limit_waits_at_most_a_minute(clock):
+    limiter = RateLimiter(0, 600, clock=clock, sleep=clock.sleep)
+    limiter.acquire(600)
+    
+    assert limiter.acquire(10000) == pytest.approx(60.0)
+
+def test_disabled_limits_never_wait(clock):
+    limiter = RateLimiter(0, None, clock=clock, sleep=clock.sleep)
+    
+    assert all(limiter.acquire(10 ** 6) == 0.0 for _ in range(100))
+    assert clock.sleeps == []